@@ -0,0 +1,413 @@
+"""
+Extraction Benchmarks
+Times PDF text extraction, PDF-to-report matching and whole process_pdfs runs over
+the data folders in reliefweb_data, and compares the results with a saved baseline.
+
+Each stage runs in a fresh process, so its peak RSS is measured on its own.
+Everything runs offline against the files on disk.
+
+Usage:
+    python benchmarks/bench_extraction.py                       # run, write benchmarks/results.json
+    python benchmarks/bench_extraction.py --save-baseline       # ...and store it as the baseline
+    python benchmarks/bench_extraction.py --stages extraction --folders Marburg
+
+The exit status is 1 when a metric is worse than the baseline by more than --tolerance,
+or when the extracted text contains lines cut apart by the table/caption filter.
+"""
+
+import argparse
+import hashlib
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import multiprocessing  # noqa: E402
+
+import pdfplumber  # noqa: E402
+
+import pdf_processor  # noqa: E402
+import serialization  # noqa: E402
+
+BENCHMARK_VERSION = 1
+STAGES = ('extraction', 'matching', 'process')
+
+DEFAULT_DATA_DIR = REPO_DIR / 'reliefweb_data'
+DEFAULT_OUTPUT = Path(__file__).resolve().parent / 'results.json'
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+DEFAULT_TOLERANCE = 0.15
+
+# Metrics where a larger value is better; every other metric is better smaller
+HIGHER_IS_BETTER = ('pages_per_sec',)
+
+
+def find_data_folders(data_dir: Path, name_filters: Optional[List[str]] = None) -> List[Path]:
+    """
+    Data folders holding a *_reports.json file and a pdfs/ directory, sorted by name.
+
+    Args:
+        data_dir: Directory containing the fetched data folders
+        name_filters: Optional substrings; only folders whose name contains one are kept
+    """
+    folders = []
+    for folder in sorted(data_dir.iterdir()):
+        if not folder.is_dir() or not (folder / 'pdfs').is_dir():
+            continue
+        if not any(folder.glob('*_reports.json')):
+            continue
+        if name_filters and not any(f in folder.name for f in name_filters):
+            continue
+        folders.append(folder)
+    return folders
+
+
+def source_json(folder: Path) -> Path:
+    return sorted(folder.glob('*_reports.json'))[0]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of values (0 for no values).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """
+    Peak resident set size of this process and of its largest finished child, in MB.
+    """
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    }
+
+
+def run_isolated(func, *args):
+    """
+    Run func(*args) in a fresh process and return its result, so peak RSS
+    readings taken inside func only cover that stage.
+    """
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp_context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def cut_lines(pdf_path: Path, text: str) -> List[str]:
+    """
+    Lines of extracted body text that are not whole lines of pdfplumber's unfiltered
+    page text. Table and caption filtering may only drop whole lines, so anything
+    returned here is a word fragment or a line cut apart by the filter.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        raw_lines = {line.strip() for page in pdf.pages for line in page.extract_text(layout=False).split('\n')}
+    return [line for line in text.split('\n') if line and line not in raw_lines]
+
+
+# --- Stages (each runs in its own process) ---
+
+def bench_extraction(folders: List[str], repeat: int) -> Dict[str, Any]:
+    """
+    Time extract_text_from_pdf on every PDF, serially in this process.
+    Each PDF's time is the median of repeat runs. The output is then checked
+    for cut lines (not timed).
+    """
+    pdfs = []
+    output_digest = hashlib.sha256()
+    for folder in map(Path, folders):
+        for pdf_path in pdf_processor.find_pdf_files(folder / 'pdfs'):
+            pages = pdf_processor.count_pdf_pages(pdf_path)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                text, tables = pdf_processor.extract_text_from_pdf(pdf_path)
+                timings.append(time.perf_counter() - start)
+            seconds = statistics.median(timings)
+            # Fingerprint of the extracted output, to tell speed changes from output changes
+            output_digest.update(serialization.dumps([pdf_path.name, text, tables], compact=True))
+            broken = cut_lines(pdf_path, text)
+            pdfs.append({
+                "folder": folder.name,
+                "pdf": pdf_path.name,
+                "bytes": pdf_path.stat().st_size,
+                "pages": pages,
+                "seconds": round(seconds, 4),
+                "seconds_per_page": round(seconds / pages, 4) if pages else None,
+                "text_chars": len(text),
+                "tables": len(tables),
+                "cut_lines": broken[:5] if broken else [],
+                "n_cut_lines": len(broken)
+            })
+
+    total_seconds = sum(p['seconds'] for p in pdfs)
+    total_pages = sum(p['pages'] for p in pdfs)
+    per_pdf = [p['seconds'] for p in pdfs]
+    per_page = [p['seconds_per_page'] for p in pdfs if p['seconds_per_page'] is not None]
+    summary = {
+        "pdfs": len(pdfs),
+        "pages": total_pages,
+        "seconds": round(total_seconds, 3),
+        "pages_per_sec": round(total_pages / total_seconds, 2) if total_seconds else 0.0,
+        "pdf_seconds_p50": round(percentile(per_pdf, 50), 4),
+        "pdf_seconds_p95": round(percentile(per_pdf, 95), 4),
+        "pdf_seconds_max": round(max(per_pdf, default=0.0), 4),
+        "page_seconds_p50": round(percentile(per_page, 50), 4),
+        "page_seconds_p95": round(percentile(per_page, 95), 4),
+        "text_chars": sum(p['text_chars'] for p in pdfs),
+        "cut_lines": sum(p['n_cut_lines'] for p in pdfs),
+        "output_sha256": output_digest.hexdigest()
+    }
+    summary.update(peak_rss_mb())
+    return {"summary": summary, "pdfs": pdfs}
+
+
+def bench_matching(folders: List[str]) -> Dict[str, Any]:
+    """
+    Time matching every PDF filename of a folder to its reports, both with
+    match_pdf_to_report (index rebuilt per call) and with a prebuilt ReportIndex.
+    """
+    results = {}
+    for folder in map(Path, folders):
+        with open(source_json(folder), 'rb') as f:
+            reports = serialization.loads(f.read()).get('reports', [])
+        names = [p.name for p in pdf_processor.find_pdf_files(folder / 'pdfs')]
+        if not names:
+            continue
+
+        def match_all():
+            for name in names:
+                pdf_processor.match_pdf_to_report(name, reports)
+
+        index = pdf_processor.ReportIndex(reports)
+
+        def index_match_all():
+            for name in names:
+                index.match(name)
+
+        number, seconds = timeit.Timer(match_all).autorange()
+        index_number, index_seconds = timeit.Timer(index_match_all).autorange()
+        build_number, build_seconds = timeit.Timer(lambda: pdf_processor.ReportIndex(reports)).autorange()
+        results[folder.name] = {
+            "pdfs": len(names),
+            "reports": len(reports),
+            "matched": sum(1 for name in names if index.match(name)[0] is not None),
+            "match_pdf_to_report_us": round(seconds / (number * len(names)) * 1e6, 2),
+            "index_build_us": round(build_seconds / build_number * 1e6, 2),
+            "index_match_us": round(index_seconds / (index_number * len(names)) * 1e6, 3)
+        }
+    return results
+
+
+def bench_process(folder: str, workers: int) -> Dict[str, Any]:
+    """
+    Time a whole process_pdfs run on a folder, writing the output to a temporary directory.
+    """
+    folder = Path(folder)
+    pdf_files = pdf_processor.find_pdf_files(folder / 'pdfs')
+    pages = sum(pdf_processor.count_pdf_pages(p) for p in pdf_files)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = Path(tmp_dir) / f"{folder.name}_full_text.json"
+        start = time.perf_counter()
+        # process_pdfs reports progress on stdout; keep the benchmark output readable
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            result = pdf_processor.process_pdfs(source_json(folder), folder / 'pdfs', output_path,
+                                                workers=workers)
+        seconds = time.perf_counter() - start
+        output_bytes = sum(os.path.getsize(path) for path in result['output_files'].values())
+
+    summary = {
+        "pdfs": len(pdf_files),
+        "pages": pages,
+        "articles": result['total_articles'],
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(pages / seconds, 2) if seconds else 0.0,
+        "output_bytes": output_bytes
+    }
+    summary.update(peak_rss_mb())
+    return summary
+
+
+# --- Results and baseline ---
+
+def flatten_metrics(results: Dict[str, Any]) -> Dict[str, float]:
+    """
+    The comparable numbers of a results document, by dotted name.
+    """
+    metrics = {}
+    extraction = results.get('extraction')
+    if extraction:
+        for name in ('pages_per_sec', 'seconds', 'pdf_seconds_p50', 'pdf_seconds_p95',
+                     'page_seconds_p50', 'page_seconds_p95', 'peak_rss_mb'):
+            metrics[f"extraction.{name}"] = extraction['summary'][name]
+    for folder, values in (results.get('matching') or {}).items():
+        for name in ('match_pdf_to_report_us', 'index_build_us', 'index_match_us'):
+            metrics[f"matching.{folder}.{name}"] = values[name]
+    for folder, values in (results.get('process') or {}).items():
+        for name in ('seconds', 'pages_per_sec', 'peak_rss_mb', 'children_peak_rss_mb', 'output_bytes'):
+            metrics[f"process.{folder}.{name}"] = values[name]
+    return metrics
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """
+    Compare the metrics present in both results and baseline.
+
+    A metric regresses when it is worse than the baseline by more than tolerance
+    (a fraction, e.g. 0.15 for 15%).
+
+    Returns:
+        Dict with per-metric changes, the regressed metric names and whether the
+        extracted output itself changed
+    """
+    current = flatten_metrics(results)
+    previous = flatten_metrics(baseline)
+    changes = {}
+    regressions = []
+    for name in sorted(current.keys() & previous.keys()):
+        old, new = previous[name], current[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        changes[name] = {"baseline": old, "current": new, "change": round(change, 4)}
+        if worse > tolerance:
+            regressions.append(name)
+
+    old_digest = (baseline.get('extraction') or {}).get('summary', {}).get('output_sha256')
+    new_digest = (results.get('extraction') or {}).get('summary', {}).get('output_sha256')
+    return {
+        "baseline_created": baseline.get('created'),
+        "tolerance": tolerance,
+        "changes": changes,
+        "regressions": regressions,
+        "extraction_output_changed": bool(old_digest and new_digest and old_digest != new_digest)
+    }
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pdfplumber_version": pdfplumber.__version__,
+        "extractor_version": pdf_processor.EXTRACTOR_VERSION,
+        "json_backend": serialization.JSON_BACKEND
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    folders = find_data_folders(Path(args.data_dir), args.folders)
+    if not folders:
+        raise SystemExit(f"No data folders with PDFs found in {args.data_dir}")
+    folder_paths = [str(folder) for folder in folders]
+    workers = args.workers or pdf_processor.default_worker_count()
+
+    results = {
+        "benchmark_version": BENCHMARK_VERSION,
+        "created": datetime.now().isoformat(),
+        "environment": environment(),
+        "config": {
+            "data_dir": str(args.data_dir),
+            "folders": [folder.name for folder in folders],
+            "stages": args.stages,
+            "repeat": args.repeat,
+            "workers": workers
+        }
+    }
+
+    if 'extraction' in args.stages:
+        print(f"Extraction: {len(folders)} folders, {args.repeat} run(s) per PDF...")
+        results['extraction'] = run_isolated(bench_extraction, folder_paths, args.repeat)
+        summary = results['extraction']['summary']
+        print(f"  {summary['pdfs']} PDFs, {summary['pages']} pages in {summary['seconds']}s: "
+              f"{summary['pages_per_sec']} pages/s, p50 {summary['pdf_seconds_p50']}s/PDF, "
+              f"{summary['page_seconds_p50']}s/page, peak RSS {summary['peak_rss_mb']} MB")
+        for pdf in results['extraction']['pdfs']:
+            if pdf['n_cut_lines']:
+                print(f"  {pdf['pdf']}: {pdf['n_cut_lines']} cut line(s), e.g. {pdf['cut_lines'][0]!r}")
+
+    if 'matching' in args.stages:
+        print("Matching...")
+        results['matching'] = run_isolated(bench_matching, folder_paths)
+        for folder, values in results['matching'].items():
+            print(f"  {folder}: match_pdf_to_report {values['match_pdf_to_report_us']}us, "
+                  f"ReportIndex.match {values['index_match_us']}us "
+                  f"({values['matched']}/{values['pdfs']} matched)")
+
+    if 'process' in args.stages:
+        print(f"process_pdfs with {workers} worker(s)...")
+        results['process'] = {}
+        for folder in folder_paths:
+            values = run_isolated(bench_process, folder, workers)
+            results['process'][Path(folder).name] = values
+            print(f"  {Path(folder).name}: {values['seconds']}s, {values['pages_per_sec']} pages/s, "
+                  f"peak RSS {values['peak_rss_mb']} MB (workers {values['children_peak_rss_mb']} MB), "
+                  f"output {values['output_bytes']} bytes")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction, matching and processing")
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR), help="Folder with fetched data folders")
+    parser.add_argument('--folders', nargs='*', help="Only benchmark folders whose name contains one of these")
+    parser.add_argument('--stages', nargs='*', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=1, help="Extraction runs per PDF (the median is kept)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Extraction workers for process_pdfs runs (0 = one per CPU core)")
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help="Where to write the results JSON")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline results to compare with")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Fraction by which a metric may be worse than the baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="Also save the results as the baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    baseline_path = Path(args.baseline)
+    regressions = []
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path, 'rb') as f:
+            comparison = compare_with_baseline(results, serialization.loads(f.read()), args.tolerance)
+        results['comparison'] = comparison
+        regressions = comparison['regressions']
+        print(f"\nCompared with baseline from {comparison['baseline_created']} "
+              f"(tolerance {args.tolerance:.0%}):")
+        for name, change in comparison['changes'].items():
+            flag = '  REGRESSION' if name in regressions else ''
+            print(f"  {name}: {change['baseline']} -> {change['current']} ({change['change']:+.1%}){flag}")
+        if comparison['extraction_output_changed']:
+            print("  Note: extracted text/tables differ from the baseline run")
+
+    serialization.dump(results, args.output)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        serialization.dump(results, baseline_path)
+        print(f"Baseline saved to {baseline_path}")
+
+    cut = (results.get('extraction') or {}).get('summary', {}).get('cut_lines', 0)
+    if cut:
+        print(f"{cut} line(s) of extracted text are not whole lines of the PDFs' text")
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+    if cut or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Fetch Pipeline Load Test
+Submits fetch jobs to the server, waits for them, and reports jobs per minute,
+job latency and per-download throughput as JSON.
+
+Without --server, the mock ReliefWeb API (mock_reliefweb.py) and the Flask server
+are started in this process, with output, job store and search index in a
+temporary directory, so the whole run is offline. Against a separately started
+server, pass --server and --mock so download timings can be read from the mock:
+
+    python benchmarks/mock_reliefweb.py --latency 0.1 --bandwidth 1024 &
+    RELIEFWEB_API_URL=http://127.0.0.1:8765/v1 gunicorn -w 2 --threads 8 reliefweb_server:app &
+    python benchmarks/load_test.py --server http://127.0.0.1:8000 --mock http://127.0.0.1:8765
+
+Usage:
+    python benchmarks/load_test.py --jobs 12 --concurrency 4 --latency 0.05 --bandwidth 2048
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_extraction import percentile  # noqa: E402
+import mock_reliefweb  # noqa: E402
+import serialization  # noqa: E402
+
+DEFAULT_OUTPUT = Path(__file__).resolve().parent / 'load_results.json'
+POLL_INTERVAL = 0.25
+
+
+def start_local_stack(args, work_dir: str) -> tuple:
+    """
+    Start the mock API and the Flask server on free local ports.
+
+    Returns:
+        tuple: (server base URL, mock base URL, list of servers to shut down)
+    """
+    mock = mock_reliefweb.start_server(Path(args.data_dir), port=0, **mock_reliefweb.fault_settings(args))
+    mock_url = f"http://127.0.0.1:{mock.server_address[1]}"
+
+    # The server reads its configuration at import time
+    os.environ['RELIEFWEB_API_URL'] = f"{mock_url}/v1"
+    os.environ['RELIEFWEB_JOB_STORE'] = 'memory'
+    os.environ['RELIEFWEB_SEARCH_INDEX'] = os.path.join(work_dir, 'search.db')
+    from werkzeug.serving import make_server
+    import reliefweb_server
+
+    # Keep the per-request access log out of the results
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, reliefweb_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", mock_url, [server, mock]
+
+
+def run_job(server_url: str, query: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Submit one fetch job (retrying while the queue is full) and poll it until it finishes.
+    """
+    start = time.perf_counter()
+    rejected = 0
+    while True:
+        response = requests.post(f"{server_url}/api/fetch", json=query, timeout=30)
+        if response.status_code != 503:
+            break
+        rejected += 1
+        time.sleep(float(response.headers.get('Retry-After') or 1))
+    response.raise_for_status()
+    job_id = response.json()['job_id']
+
+    status = {}
+    while time.perf_counter() - start < timeout:
+        status = requests.get(f"{server_url}/api/status/{job_id}", timeout=30).json()
+        if status.get('status') in ('completed', 'error'):
+            break
+        time.sleep(POLL_INTERVAL)
+    else:
+        status = dict(status, status='timeout')
+
+    return {
+        'job_id': job_id,
+        'query': f"{query['disaster_name']} / {query['country_code']}",
+        'status': status.get('status'),
+        'message': status.get('message'),
+        'seconds': round(time.perf_counter() - start, 3),
+        'reports': status.get('total_reports', 0),
+        'pdfs': status.get('downloaded_pdfs', 0),
+        'rejected': rejected
+    }
+
+
+def mock_stats(mock_url: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not mock_url:
+        return None
+    return requests.get(f"{mock_url}/stats", timeout=30).json()
+
+
+def summarize(jobs: List[Dict[str, Any]], seconds: float, before: Optional[Dict[str, Any]],
+              after: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    completed = [job for job in jobs if job['status'] == 'completed']
+    job_seconds = [job['seconds'] for job in completed]
+    summary = {
+        'jobs': len(jobs),
+        'completed': len(completed),
+        'failed': len(jobs) - len(completed),
+        'rejected_submissions': sum(job['rejected'] for job in jobs),
+        'seconds': round(seconds, 3),
+        'jobs_per_minute': round(len(completed) / seconds * 60, 2) if seconds else 0.0,
+        'job_seconds_p50': round(percentile(job_seconds, 50), 3),
+        'job_seconds_p95': round(percentile(job_seconds, 95), 3),
+        'job_seconds_max': round(max(job_seconds, default=0.0), 3),
+        'pdfs_downloaded': sum(job['pdfs'] for job in completed)
+    }
+    if before is not None and after is not None:
+        # Only the downloads served during this run
+        downloads = after['downloads'][len(before['downloads']):]
+        throughputs = [size / secs / (1024 * 1024) for size, secs in downloads if secs > 0]
+        total_bytes = after['bytes_sent'] - before['bytes_sent']
+        summary.update({
+            'api_requests': after['api_requests'] - before['api_requests'],
+            'file_requests': after['file_requests'] - before['file_requests'],
+            'injected_errors': after['injected_errors'] - before['injected_errors'],
+            'downloads': len(downloads),
+            'bytes_served': total_bytes,
+            'download_mb_per_sec_p50': round(percentile(throughputs, 50), 3),
+            'download_mb_per_sec_p5': round(percentile(throughputs, 5), 3),
+            'aggregate_mb_per_sec': round(total_bytes / seconds / (1024 * 1024), 3) if seconds else 0.0
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the fetch pipeline against the mock ReliefWeb API")
+    parser.add_argument('--server', help="Base URL of a running server (default: start one in-process)")
+    parser.add_argument('--mock', help="Base URL of the mock API the server uses, for download statistics")
+    parser.add_argument('--data-dir', default=str(mock_reliefweb.DEFAULT_DATA_DIR),
+                        help="Data folders replayed by the in-process mock, and the source of the queries")
+    parser.add_argument('--jobs', type=int, default=8, help="Fetch jobs to run")
+    parser.add_argument('--concurrency', type=int, default=2, help="Jobs in flight at once")
+    parser.add_argument('--incremental', action='store_true', help="Submit incremental fetch jobs")
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds before a job counts as timed out")
+    parser.add_argument('--output-dir', help="output_dir sent with each fetch job (default: a temporary "
+                                             "folder in-process, the server's data folder with --server)")
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help="Where to write the results JSON")
+    mock_reliefweb.add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    queries = mock_reliefweb.queries(mock_reliefweb.load_corpus(Path(args.data_dir)))
+    if not queries:
+        raise SystemExit(f"No reports found in {args.data_dir}")
+
+    with tempfile.TemporaryDirectory(prefix='reliefweb_load_') as work_dir:
+        servers = []
+        server_url, mock_url = args.server, args.mock
+        if not server_url:
+            server_url, mock_url, servers = start_local_stack(args, work_dir)
+        # A separately started server writes to its own data folder unless told otherwise
+        output_dir = args.output_dir or (None if args.server else os.path.join(work_dir, 'data'))
+
+        job_queries = []
+        for i in range(args.jobs):
+            query = dict(queries[i % len(queries)], incremental=args.incremental)
+            if output_dir:
+                query['output_dir'] = output_dir
+            job_queries.append(query)
+        print(f"Running {args.jobs} fetch jobs, {args.concurrency} at a time, against {server_url}...")
+        before = mock_stats(mock_url)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            jobs = list(executor.map(lambda query: run_job(server_url, query, args.timeout), job_queries))
+        seconds = time.perf_counter() - start
+        after = mock_stats(mock_url)
+
+        for server in servers:
+            server.shutdown()
+
+    for job in jobs:
+        print(f"  {job['query']}: {job['status']} in {job['seconds']}s, {job['pdfs']} PDFs")
+    summary = summarize(jobs, seconds, before, after)
+    print(f"\n{summary['completed']}/{summary['jobs']} jobs completed in {summary['seconds']}s "
+          f"({summary['jobs_per_minute']} jobs/min, p50 {summary['job_seconds_p50']}s per job)")
+    if 'downloads' in summary:
+        print(f"{summary['downloads']} downloads, {summary['bytes_served']} bytes: "
+              f"p50 {summary['download_mb_per_sec_p50']} MB/s per download, "
+              f"{summary['aggregate_mb_per_sec']} MB/s aggregate, {summary['injected_errors']} injected errors")
+
+    results = {
+        'created': datetime.now().isoformat(),
+        'config': {
+            'server': args.server or 'in-process',
+            'jobs': args.jobs,
+            'concurrency': args.concurrency,
+            'incremental': args.incremental,
+            'mock': mock_reliefweb.fault_settings(args) if not args.server else args.mock
+        },
+        'summary': summary,
+        'jobs': jobs
+    }
+    serialization.dump(results, args.output)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
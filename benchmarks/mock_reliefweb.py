@@ -0,0 +1,347 @@
+"""
+Mock ReliefWeb API
+Local stand-in for api.reliefweb.int that replays the reports and PDFs saved in the
+data folders of reliefweb_data, so the fetch pipeline can be load-tested offline.
+
+Serves POST /v1/reports (filtered on primary_country.iso3 and disaster.name, with
+offset/limit paging), GET /v1/countries, the PDFs under /files/, and GET /stats with
+request, byte and per-download timing counters. Latency, bandwidth and error rates
+are configurable to mimic slow or flaky links.
+
+Usage:
+    python benchmarks/mock_reliefweb.py --port 8765 --latency 0.2 --bandwidth 512 --file-error-rate 0.05
+    RELIEFWEB_API_URL=http://127.0.0.1:8765/v1 python reliefweb_server.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict, Any, List
+from urllib.parse import urlparse, unquote
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import serialization  # noqa: E402
+
+DEFAULT_DATA_DIR = REPO_DIR / 'reliefweb_data'
+DEFAULT_PORT = 8765
+
+# File bodies are written in chunks of at most this size, so bandwidth limits stay smooth
+SEND_CHUNK_SIZE = 64 * 1024
+# Per-download timings kept for /stats
+MAX_RECORDED_DOWNLOADS = 100_000
+
+
+def load_corpus(data_dir: Path) -> Dict[tuple, Dict[str, Any]]:
+    """
+    Collect the reports of every data folder by query.
+
+    Runs of the same query are merged, newest run first, keeping each report once.
+    Only files still present in the folder's pdfs/ directory are served.
+
+    Returns:
+        Dict keyed by (lowercase country code, lowercase disaster name) with the
+        disaster, country, country_code and reports of that query; each report
+        carries a '_files' list of (original filename, file route, path)
+    """
+    corpus = {}
+    for folder in sorted(Path(data_dir).iterdir(), reverse=True):
+        if not folder.is_dir():
+            continue
+        for json_path in sorted(folder.glob('*_reports.json')):
+            try:
+                with open(json_path, 'rb') as f:
+                    data = serialization.loads(f.read())
+            except (OSError, ValueError) as e:
+                print(f"Skipping {json_path}: {e}")
+                continue
+            country_code = str(data.get('country_code', ''))
+            disaster = str(data.get('disaster', ''))
+            entry = corpus.setdefault((country_code.lower(), disaster.lower()), {
+                'disaster': disaster,
+                'country': data.get('country', ''),
+                'country_code': country_code,
+                'reports': [],
+                '_ids': set()
+            })
+            for report in data.get('reports', []):
+                report_id = str(report.get('reliefweb_id', ''))
+                if report_id in entry['_ids']:
+                    continue
+                entry['_ids'].add(report_id)
+                files = []
+                for file_info in report.get('files', []):
+                    saved_filename = file_info.get('saved_filename', '') or file_info.get('filename', '')
+                    pdf_path = folder / 'pdfs' / saved_filename
+                    if saved_filename and pdf_path.exists():
+                        original = os.path.basename(urlparse(file_info.get('url', '')).path) or saved_filename
+                        files.append((original, f"/files/{folder.name}/{saved_filename}", pdf_path))
+                entry['reports'].append(dict(report, _files=files))
+    for entry in corpus.values():
+        del entry['_ids']
+    return corpus
+
+
+def queries(corpus: Dict[tuple, Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    The fetch queries the corpus can answer, as /api/fetch request bodies.
+    """
+    return [
+        {'disaster_name': entry['disaster'], 'country_code': entry['country_code'], 'country_name': entry['country']}
+        for _, entry in sorted(corpus.items())
+    ]
+
+
+def api_report(report: Dict[str, Any], entry: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    """
+    A saved report in the shape of a ReliefWeb API 'full' profile item.
+    """
+    return {
+        'id': report.get('reliefweb_id', ''),
+        'fields': {
+            'id': report.get('reliefweb_id', ''),
+            'title': report.get('title', ''),
+            'date': report.get('date', {}),
+            'url_alias': report.get('url', ''),
+            'body-html': report.get('body_text', ''),
+            'source': [{'name': name} for name in report.get('source', [])],
+            'primary_country': {'iso3': entry['country_code'], 'name': entry['country']},
+            'disaster': [{'name': entry['disaster']}],
+            'language': [{'code': 'en'}],
+            'file': [{'filename': original, 'url': f"{base_url}{route}"} for original, route, _ in report['_files']]
+        }
+    }
+
+
+class MockReliefWebServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server holding the corpus, the fault/latency settings and the counters.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, corpus, latency=0.0, jitter=0.0, bandwidth_kbps=0.0,
+                 api_error_rate=0.0, file_error_rate=0.0, seed=None):
+        super().__init__(address, MockReliefWebHandler)
+        self.corpus = corpus
+        self.files = {
+            route: path
+            for entry in corpus.values() for report in entry['reports'] for _, route, path in report['_files']
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth_kbps * 1024
+        self.api_error_rate = api_error_rate
+        self.file_error_rate = file_error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {
+            'api_requests': 0,
+            'file_requests': 0,
+            'injected_errors': 0,
+            'bytes_sent': 0,
+            'downloads': []  # [bytes, seconds] per completed file download
+        }
+
+    def chance(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def record_download(self, size: int, seconds: float):
+        with self._lock:
+            downloads = self._stats['downloads']
+            if len(downloads) < MAX_RECORDED_DOWNLOADS:
+                downloads.append([size, round(seconds, 6)])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, downloads=list(self._stats['downloads']))
+
+
+class MockReliefWebHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: MockReliefWebServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _base_url(self) -> str:
+        return f"http://{self.headers.get('Host') or '%s:%d' % self.server.server_address[:2]}"
+
+    def _send(self, status: int, body: bytes, content_type: str, throttle: bool = False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+
+        bandwidth = self.server.bandwidth if throttle else 0
+        if not bandwidth:
+            self.wfile.write(body)
+        else:
+            chunk_size = max(1024, min(SEND_CHUNK_SIZE, int(bandwidth / 10)))
+            start = time.perf_counter()
+            for offset in range(0, len(body), chunk_size):
+                self.wfile.write(body[offset:offset + chunk_size])
+                ahead = (offset + chunk_size) / bandwidth - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+        self.server.count('bytes_sent', len(body))
+
+    def _send_json(self, data: Any, status: int = 200):
+        self._send(status, json.dumps(data).encode('utf-8'), 'application/json')
+
+    def _inject_fault(self, rate: float) -> bool:
+        delay = self.server.delay()
+        if delay:
+            time.sleep(delay)
+        if self.server.chance(rate):
+            self.server.count('injected_errors')
+            self._send_json({'error': 'Injected failure'}, 503)
+            return True
+        return False
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if path.rstrip('/') != '/v1/reports':
+            return self._send_json({'error': 'Not found'}, 404)
+
+        self.server.count('api_requests')
+        if self._inject_fault(self.server.api_error_rate):
+            return
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self._send_json({'error': 'Invalid JSON'}, 400)
+        self._send_json(self._reports_page(payload))
+
+    def _reports_page(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        conditions = {
+            condition.get('field'): str(condition.get('value', '')).lower()
+            for condition in (payload.get('filter') or {}).get('conditions', [])
+            if not condition.get('negate')
+        }
+        key = (conditions.get('primary_country.iso3', ''), conditions.get('disaster.name', ''))
+        entry = self.server.corpus.get(key)
+        reports = entry['reports'] if entry else []
+
+        offset = int(payload.get('offset', 0))
+        limit = int(payload.get('limit', 10))
+        page = reports[offset:offset + limit]
+        base_url = self._base_url()
+        return {
+            'totalCount': len(reports),
+            'count': len(page),
+            'data': [api_report(report, entry, base_url) for report in page]
+        }
+
+    def do_GET(self):
+        path = unquote(urlparse(self.path).path)
+        if path == '/stats':
+            return self._send_json(self.server.stats())
+        if path.rstrip('/') == '/v1/countries':
+            self.server.count('api_requests')
+            if self._inject_fault(self.server.api_error_rate):
+                return
+            countries = {(entry['country_code'].upper(), entry['country']) for entry in self.server.corpus.values()}
+            data = [{'id': i, 'fields': {'id': i, 'iso3': iso3, 'name': name}}
+                    for i, (iso3, name) in enumerate(sorted(countries), 1)]
+            return self._send_json({'totalCount': len(data), 'count': len(data), 'data': data})
+
+        pdf_path = self.server.files.get(path)
+        if pdf_path is None:
+            return self._send_json({'error': 'Not found'}, 404)
+        self.server.count('file_requests')
+        start = time.perf_counter()
+        if self._inject_fault(self.server.file_error_rate):
+            return
+        with open(pdf_path, 'rb') as f:
+            data = f.read()
+        self._send(200, data, 'application/pdf', throttle=True)
+        self.server.record_download(len(data), time.perf_counter() - start)
+
+
+def start_server(data_dir: Path = DEFAULT_DATA_DIR, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                 **settings) -> MockReliefWebServer:
+    """
+    Start the mock server on a background thread (port 0 picks a free port).
+
+    Args:
+        data_dir: Folder with the data folders to replay
+        host, port: Address to listen on
+        **settings: latency / jitter (seconds), bandwidth_kbps (per connection, 0 = unlimited),
+                    api_error_rate / file_error_rate (fraction of requests answered 503), seed
+
+    Returns:
+        MockReliefWebServer: call shutdown() to stop it; server_address holds the bound port
+    """
+    server = MockReliefWebServer((host, port), load_corpus(data_dir), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added before every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra random seconds")
+    parser.add_argument('--bandwidth', type=float, default=0.0,
+                        help="KB/s per file download (0 = unlimited)")
+    parser.add_argument('--api-error-rate', type=float, default=0.0,
+                        help="Fraction of API requests answered with 503")
+    parser.add_argument('--file-error-rate', type=float, default=0.0,
+                        help="Fraction of file downloads answered with 503")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible jitter and errors")
+
+
+def fault_settings(args) -> Dict[str, Any]:
+    return {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'bandwidth_kbps': args.bandwidth,
+        'api_error_rate': args.api_error_rate,
+        'file_error_rate': args.file_error_rate,
+        'seed': args.seed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the ReliefWeb API replaying reliefweb_data")
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockReliefWebServer((args.host, args.port), load_corpus(Path(args.data_dir)), **fault_settings(args))
+    host, port = server.server_address[:2]
+    print(f"Mock ReliefWeb API on http://{host}:{port}/v1 ({len(server.files)} files)")
+    for query in queries(server.corpus):
+        print(f"  {query['disaster_name']} / {query['country_code']}")
+    print(f"Run the server with RELIEFWEB_API_URL=http://{host}:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
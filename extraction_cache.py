@@ -0,0 +1,142 @@
+"""
+PDF Extraction Cache
+On-disk cache of PDF text extraction results, keyed by PDF content hash.
+Entries are evicted least-recently-used first once the cache grows past its size limit.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import serialization
+
+
+class ExtractionCache:
+    """
+    Stores the (text, tables) result of extract_text_from_pdf on disk, with the
+    near-duplicate signature of the text when it was computed.
+
+    The cache key combines the SHA-256 of the PDF bytes with the extractor
+    settings, so byte-identical PDFs (e.g. the same report fetched in two runs)
+    are only parsed once, and changing the extractor invalidates old entries.
+    Hit/miss counters are kept per instance, so one instance per job gives
+    per-job statistics.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory holding the cache entries
+            max_bytes: Total size above which least-recently-used entries are evicted
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    @staticmethod
+    def file_hash(pdf_path: Path) -> str:
+        """
+        SHA-256 of a file's contents, read in chunks.
+        """
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key_for(self, pdf_path: Path, settings: Dict[str, Any]) -> str:
+        """
+        Build the cache key for a PDF and the extractor settings used on it.
+        """
+        settings_json = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(f"{self.file_hash(pdf_path)}:{settings_json}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[tuple]:
+        """
+        Look up a cached extraction result.
+
+        Returns:
+            Optional[tuple]: (text, tables, signature or None) or None on a miss
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = serialization.loads(f.read())
+            # Touch the entry so eviction treats it as recently used
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        signature = entry.get('signature')
+        return entry['text'], entry['tables'], tuple(signature) if signature else None
+
+    def put(self, key: str, text: str, tables: list, signature: Optional[tuple] = None):
+        """
+        Store an extraction result, evicting old entries if the cache is full.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                entry = {"text": text, "tables": tables}
+                if signature is not None:
+                    entry["signature"] = list(signature)
+                f.write(serialization.dumps(entry, compact=True))
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            print(f"Warning: could not write extraction cache entry {key}: {e}")
+            return
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += entry_path.stat().st_size
+
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self) -> list:
+        entries = []
+        for entry_path in self.cache_dir.glob('*/*.json'):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """
+        Remove least-recently-used entries until the cache fits in max_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                entry_path.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Hit/miss counters for this instance.
+        """
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
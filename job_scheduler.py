@@ -0,0 +1,151 @@
+"""
+Background Job Scheduler
+Runs background jobs on a fixed number of worker threads behind a bounded queue,
+so bursts of requests wait their turn (or are turned away) instead of oversubscribing the server.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a scheduler whose queue is full."""
+
+
+class JobScheduler:
+    """
+    Bounded FIFO queue of jobs served by a fixed set of worker threads.
+
+    on_queue_change(waiting_job_ids) is called, with the scheduler lock held,
+    every time the queue changes, so callers can publish queue positions
+    before a job starts running. on_heartbeat(job_ids) is called every
+    heartbeat_interval seconds with the running and waiting job ids, so callers
+    can show that those jobs are still alive.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queued: int,
+                 on_queue_change: Optional[Callable[[List[str]], None]] = None,
+                 on_heartbeat: Optional[Callable[[List[str]], None]] = None,
+                 heartbeat_interval: float = 60.0):
+        """
+        Args:
+            name: Name used for the worker threads and log lines
+            concurrency: Number of jobs run at the same time
+            max_queued: Number of jobs allowed to wait; further submissions are rejected
+            on_queue_change: Optional callback receiving the waiting job ids in queue order
+            on_heartbeat: Optional callback receiving the running and waiting job ids periodically
+            heartbeat_interval: Seconds between on_heartbeat calls
+        """
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max(0, max_queued)
+        self.on_queue_change = on_queue_change
+        self.on_heartbeat = on_heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        self._waiting = deque()
+        self._running = 0
+        self._running_ids = set()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._heartbeat = None
+
+    def _start_workers(self):
+        # Started lazily so that importing the server does not spawn threads
+        while len(self._workers) < self.concurrency:
+            worker = threading.Thread(
+                target=self._work, name=f"{self.name}-worker-{len(self._workers) + 1}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        if self.on_heartbeat is not None and self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._beat, name=f"{self.name}-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            job_ids = self.job_ids()
+            if not job_ids:
+                continue
+            try:
+                self.on_heartbeat(job_ids)
+            except Exception as e:
+                print(f"[{self.name}] Heartbeat failed: {e}")
+
+    def _publish_queue(self):
+        if self.on_queue_change:
+            try:
+                self.on_queue_change([job_id for job_id, _, _ in self._waiting])
+            except Exception as e:
+                print(f"[{self.name}] Could not publish queue positions: {e}")
+
+    def _has_capacity(self) -> bool:
+        # A job is accepted if a worker is free or the queue has room
+        return (self._running + len(self._waiting) < self.concurrency
+                or len(self._waiting) < self.max_queued)
+
+    def has_capacity(self) -> bool:
+        """
+        Whether a job submitted now would be accepted.
+        """
+        with self._condition:
+            return self._has_capacity()
+
+    def submit(self, job_id: str, fn: Callable, *args) -> int:
+        """
+        Queue fn(*args) to run as job_id.
+
+        Returns:
+            int: 1-based position in the queue
+
+        Raises:
+            QueueFullError: if the queue is full
+        """
+        with self._condition:
+            if not self._has_capacity():
+                raise QueueFullError(f"{self.name} queue is full ({self.max_queued} jobs waiting)")
+            self._waiting.append((job_id, fn, args))
+            self._publish_queue()
+            self._start_workers()
+            self._condition.notify()
+            return len(self._waiting)
+
+    def stats(self) -> dict:
+        """
+        Current number of running and waiting jobs.
+        """
+        with self._condition:
+            return {
+                "running": self._running,
+                "queued": len(self._waiting),
+                "concurrency": self.concurrency,
+                "max_queued": self.max_queued
+            }
+
+    def job_ids(self) -> List[str]:
+        """
+        Ids of the running jobs, then the waiting ones in queue order.
+        """
+        with self._condition:
+            return list(self._running_ids) + [job_id for job_id, _, _ in self._waiting]
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._waiting:
+                    self._condition.wait()
+                job_id, fn, args = self._waiting.popleft()
+                self._running += 1
+                self._running_ids.add(job_id)
+                self._publish_queue()
+
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[{self.name}] Job {job_id} failed: {e}")
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    self._running_ids.discard(job_id)
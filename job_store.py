@@ -0,0 +1,332 @@
+"""
+Job State Store
+Keeps fetch/process job status and file records where every server worker can see them.
+A SQLite file is the default backend; an in-memory backend is available for single-process use.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+
+# Statuses after which a job no longer changes and can be expired
+FINISHED_STATUSES = ('completed', 'error')
+
+# Status given to unfinished jobs that stopped being updated (e.g. their worker was restarted)
+INTERRUPTED_STATUS = {
+    'status': 'error',
+    'progress': 0,
+    'interrupted': True,
+    'message': 'Error: the job was interrupted (its server worker stopped); please start it again'
+}
+
+
+class JobStore:
+    """
+    Interface for job state backends.
+
+    State is a JSON-serialisable dict per (namespace, job_id), where the
+    namespace separates kinds of state (e.g. 'download_status', 'process_files').
+
+    Cleanup runs at most every cleanup_interval seconds, on writes. It expires
+    finished jobs not updated for ttl_seconds, and marks as interrupted the
+    unfinished jobs whose status was not updated for stale_seconds: jobs run on
+    their worker's own threads, so they cannot outlive a worker restart. Workers
+    touch() the jobs they hold to keep them alive while they wait or run quietly.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, stale_seconds: Optional[float] = None,
+                 cleanup_interval: float = 60.0,
+                 on_expire: Optional[Callable[[Dict[str, Dict[str, Dict[str, Any]]]], None]] = None):
+        """
+        Args:
+            ttl_seconds: Expire finished jobs after this long (None disables automatic cleanup)
+            stale_seconds: Mark unfinished jobs as interrupted after this long without updates
+                           (None never does)
+            cleanup_interval: Minimum seconds between automatic cleanups on write
+            on_expire: Called after a cleanup with {job_id: {namespace: data}} of the jobs it
+                       removed, to delete files and other resources kept for them
+        """
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.cleanup_interval = cleanup_interval
+        self.on_expire = on_expire
+        self._last_cleanup = 0.0
+
+    def get(self, namespace: str, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, job_id: str, data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def patch(self, namespace: str, job_id: str, fields: Dict[str, Any]):
+        """Merge fields into the stored dict (creating it if missing)."""
+        raise NotImplementedError
+
+    def touch(self, namespace: str, job_ids: List[str]):
+        """Mark the given jobs as updated now, without changing their state."""
+        raise NotImplementedError
+
+    def interrupt_stale(self, stale_seconds: float) -> List[str]:
+        """
+        Mark unfinished jobs whose status was not updated for stale_seconds as
+        interrupted. Returns their job ids.
+        """
+        raise NotImplementedError
+
+    def expire(self, ttl_seconds: float) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Remove finished jobs not updated for ttl_seconds.
+
+        Returns:
+            Dict: {job_id: {namespace: data}} of the removed jobs
+        """
+        raise NotImplementedError
+
+    def cleanup(self, ttl_seconds: float, stale_seconds: Optional[float] = None) -> int:
+        """
+        Interrupt stale unfinished jobs (if stale_seconds is given), then remove finished
+        jobs not updated for ttl_seconds and pass them to on_expire. Returns the number removed.
+        """
+        if stale_seconds is not None:
+            interrupted = self.interrupt_stale(stale_seconds)
+            if interrupted:
+                print(f"Job store: marked {len(interrupted)} stale jobs as interrupted: {', '.join(interrupted)}")
+        expired = self.expire(ttl_seconds)
+        if expired and self.on_expire is not None:
+            try:
+                self.on_expire(expired)
+            except Exception as e:
+                print(f"Job store: cleaning up after expired jobs failed: {e}")
+        return len(expired)
+
+    def _maybe_cleanup(self):
+        now = time.time()
+        if self.ttl_seconds is None or now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        try:
+            removed = self.cleanup(self.ttl_seconds, self.stale_seconds)
+            if removed:
+                print(f"Job store: expired {removed} finished jobs")
+        except sqlite3.Error as e:
+            print(f"Job store cleanup failed: {e}")
+
+    def table(self, namespace: str) -> 'JobTable':
+        return JobTable(self, namespace)
+
+
+class MemoryJobStore(JobStore):
+    """
+    Process-local backend. Only suitable for a single server worker.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, namespace, job_id):
+        with self._lock:
+            entry = self._data.get((namespace, job_id))
+            return dict(entry[0]) if entry else None
+
+    def set(self, namespace, job_id, data):
+        with self._lock:
+            self._data[(namespace, job_id)] = (dict(data), time.time())
+        self._maybe_cleanup()
+
+    def patch(self, namespace, job_id, fields):
+        with self._lock:
+            current = self._data.get((namespace, job_id), ({}, 0))[0]
+            self._data[(namespace, job_id)] = (dict(current, **fields), time.time())
+
+    def touch(self, namespace, job_ids):
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids:
+                entry = self._data.get((namespace, job_id))
+                if entry is not None:
+                    self._data[(namespace, job_id)] = (entry[0], now)
+
+    def interrupt_stale(self, stale_seconds):
+        cutoff = time.time() - stale_seconds
+        with self._lock:
+            stale = [
+                key for key, (data, updated_at) in self._data.items()
+                if 'status' in data and data['status'] not in FINISHED_STATUSES and updated_at < cutoff
+            ]
+            for key in stale:
+                self._data[key] = (dict(self._data[key][0], **INTERRUPTED_STATUS), time.time())
+        return [job_id for _, job_id in stale]
+
+    def expire(self, ttl_seconds):
+        cutoff = time.time() - ttl_seconds
+        with self._lock:
+            finished_jobs = {
+                job_id for (namespace, job_id), (data, updated_at) in self._data.items()
+                if data.get('status') in FINISHED_STATUSES and updated_at < cutoff
+            }
+            expired = {}
+            for key in [key for key in self._data if key[1] in finished_jobs]:
+                expired.setdefault(key[1], {})[key[0]] = self._data.pop(key)[0]
+        return expired
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Backend on a SQLite file, shared by every worker process on the host.
+
+    Each thread keeps its own connection; WAL mode lets status reads run
+    alongside writes from the background jobs.
+    """
+
+    def __init__(self, db_path: str, **kwargs):
+        """
+        Args:
+            db_path: Path of the SQLite database file
+            kwargs: Cleanup settings, see JobStore
+        """
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " namespace TEXT NOT NULL,"
+            " job_id TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " finished INTEGER NOT NULL DEFAULT 0,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, job_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (finished, updated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, conn, namespace, job_id, data):
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (namespace, job_id, data, finished, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, job_id, json.dumps(data), int(data.get('status') in FINISHED_STATUSES), time.time())
+        )
+
+    def get(self, namespace, job_id):
+        row = self._connection().execute(
+            "SELECT data FROM jobs WHERE namespace = ? AND job_id = ?", (namespace, job_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace, job_id, data):
+        self._write(self._connection(), namespace, job_id, data)
+        self._maybe_cleanup()
+
+    def patch(self, namespace, job_id, fields):
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front so concurrent patches don't lose updates
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM jobs WHERE namespace = ? AND job_id = ?", (namespace, job_id)
+            ).fetchone()
+            data = json.loads(row[0]) if row else {}
+            data.update(fields)
+            self._write(conn, namespace, job_id, data)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def touch(self, namespace, job_ids):
+        now = time.time()
+        self._connection().executemany(
+            "UPDATE jobs SET updated_at = ? WHERE namespace = ? AND job_id = ?",
+            [(now, namespace, job_id) for job_id in job_ids]
+        )
+
+    def interrupt_stale(self, stale_seconds):
+        conn = self._connection()
+        cutoff = time.time() - stale_seconds
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Only status records carry a 'status'; file records of the same job stay as they are
+            stale = conn.execute(
+                "SELECT namespace, job_id, data FROM jobs"
+                " WHERE finished = 0 AND updated_at < ? AND json_extract(data, '$.status') IS NOT NULL",
+                (cutoff,)
+            ).fetchall()
+            for namespace, job_id, data in stale:
+                self._write(conn, namespace, job_id, dict(json.loads(data), **INTERRUPTED_STATUS))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [job_id for _, job_id, _ in stale]
+
+    def expire(self, ttl_seconds):
+        conn = self._connection()
+        cutoff = time.time() - ttl_seconds
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT namespace, job_id, data FROM jobs WHERE job_id IN"
+                " (SELECT job_id FROM jobs WHERE finished = 1 AND updated_at < ?)", (cutoff,)
+            ).fetchall()
+            expired = {}
+            for namespace, job_id, data in rows:
+                expired.setdefault(job_id, {})[namespace] = json.loads(data)
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in expired])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return expired
+
+
+class JobTable:
+    """
+    Dict-like view of one namespace of a JobStore.
+
+    Reads return copies: use patch() (not item mutation) to change stored state.
+    """
+
+    def __init__(self, store: JobStore, namespace: str):
+        self.store = store
+        self.namespace = namespace
+
+    def __contains__(self, job_id):
+        return self.store.get(self.namespace, job_id) is not None
+
+    def __getitem__(self, job_id):
+        data = self.store.get(self.namespace, job_id)
+        if data is None:
+            raise KeyError(job_id)
+        return data
+
+    def __setitem__(self, job_id, data):
+        self.store.set(self.namespace, job_id, data)
+
+    def get(self, job_id, default=None):
+        data = self.store.get(self.namespace, job_id)
+        return default if data is None else data
+
+    def patch(self, job_id, fields: Dict[str, Any]):
+        self.store.patch(self.namespace, job_id, fields)
+
+
+def create_job_store(spec: str, **kwargs) -> JobStore:
+    """
+    Build a job store from a spec: 'memory', or the path of a SQLite database file.
+    kwargs are the cleanup settings of JobStore.
+    """
+    if spec == 'memory':
+        return MemoryJobStore(**kwargs)
+    return SQLiteJobStore(spec, **kwargs)
@@ -0,0 +1,383 @@
+"""
+Metrics
+Prometheus-style counters, gauges and histograms kept in process memory, and a
+per-job stage timer that feeds them. The registry renders the Prometheus text
+exposition format served at /api/metrics, merging the values of every server
+worker process when they share a metrics directory.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional
+
+import serialization
+
+# Histogram buckets in seconds, from sub-millisecond steps up to whole-job durations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        if value.is_integer():
+            return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        if not self.labelnames:
+            # An unlabelled metric has a single series, reported from the start
+            self._values[()] = self._initial()
+
+    def _initial(self):
+        return 0
+
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: tuple = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def _samples(self, values: dict):
+        raise NotImplementedError
+
+    def _copy(self, value):
+        return value
+
+    def _combine(self, a, b):
+        """Value of a series present in two worker processes"""
+        return a + b
+
+    def snapshot(self) -> list:
+        """Current series as [[label values...], value] pairs that can be stored as JSON"""
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def merge(self, snapshots: list) -> dict:
+        """Combine the snapshots of several processes into {label values: value}"""
+        values = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                key = tuple(key)
+                values[key] = self._combine(values[key], value) if key in values else value
+        return values
+
+    def render(self, values: Optional[dict] = None) -> str:
+        """Text exposition of this process's values, or of merged values"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if values is None:
+            with self._lock:
+                lines.extend(f"{name}{labels} {_format_value(value)}"
+                             for name, labels, value in self._samples(self._values))
+        else:
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples(values))
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing total."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, values: dict):
+        for key, value in sorted(values.items()):
+            yield self.name, self._labels(key), value
+
+
+class Gauge(_Metric):
+    """Value that goes up and down."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self, values: dict):
+        for key, value in sorted(values.items()):
+            yield self.name, self._labels(key), value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _initial(self):
+        return [[0] * len(self.buckets), 0.0, 0]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = self._initial()
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _combine(self, a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def _samples(self, values: dict):
+        for key, (bucket_counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", self._labels(key, (('le', _format_value(float(bound))),)), cumulative
+            yield f"{self.name}_bucket", self._labels(key, (('le', '+Inf'),)), count
+            yield f"{self.name}_sum", self._labels(key), total
+            yield f"{self.name}_count", self._labels(key), count
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """
+    Named metrics, rendered together in registration order.
+
+    By default each process reports only its own values. After share(directory),
+    every process writes its values to its own file under directory and render()
+    merges the files of all worker processes of the same server, so a scrape
+    answered by any worker sees the server's totals.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collect_hooks = []
+        self._group_dir = None
+        self._path = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def on_collect(self, hook: Callable[[], None]):
+        """Call hook to bring gauges up to date before each render and each write to the shared directory"""
+        self._collect_hooks.append(hook)
+
+    def _collect(self):
+        for hook in self._collect_hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"Warning: metrics collection hook failed: {e}")
+
+    def share(self, directory: str, interval: float = 5):
+        """
+        Aggregate metrics across the worker processes of a server (e.g. gunicorn --workers N).
+
+        This process writes its values to directory/<parent pid>/<pid>.json every
+        interval seconds and on exit, so scrapes see the other workers' values at
+        most interval seconds late. Counters and histograms are summed over every
+        file in the group, including those of workers that have exited, so a worker
+        restart doesn't look like a counter reset; gauges are summed over live workers
+        only. Groups left by servers that are no longer running are removed.
+
+        Args:
+            directory: Folder shared by the server's worker processes
+            interval: Seconds between writes of this process's values
+        """
+        root = Path(directory)
+        group = str(os.getppid())
+        root.mkdir(parents=True, exist_ok=True)
+        for entry in root.iterdir():
+            if entry.is_dir() and entry.name.isdigit() and entry.name != group and not _process_alive(int(entry.name)):
+                shutil.rmtree(entry, ignore_errors=True)
+
+        self._group_dir = root / group
+        self._group_dir.mkdir(exist_ok=True)
+        self._path = self._group_dir / f"{os.getpid()}.json"
+        self._write()
+        atexit.register(self._write)
+
+        def flush():
+            while True:
+                time.sleep(interval)
+                self._write()
+
+        threading.Thread(target=flush, name='metrics-share', daemon=True).start()
+
+    def _snapshot(self) -> dict:
+        self._collect()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def _write(self):
+        try:
+            data = serialization.dumps({'pid': os.getpid(), 'metrics': self._snapshot()}, compact=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._group_dir, prefix='.', suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            print(f"Warning: could not write metrics to {self._path}: {e}")
+
+    def _read_group(self) -> list:
+        processes = []
+        for path in self._group_dir.glob('*.json'):
+            try:
+                processes.append(serialization.loads(path.read_bytes()))
+            except (OSError, ValueError):
+                continue
+        return processes
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        if self._group_dir is None:
+            self._collect()
+            return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+        self._write()
+        processes = self._read_group()
+        alive = {process['pid'] for process in processes if _process_alive(process['pid'])}
+        rendered = []
+        for metric in metrics:
+            snapshots = [process['metrics'].get(metric.name, []) for process in processes
+                         if metric.kind != 'gauge' or process['pid'] in alive]
+            rendered.append(metric.render(metric.merge(snapshots)))
+        return '\n'.join(rendered) + '\n'
+
+
+REGISTRY = Registry()
+
+# Content type of the text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'reliefweb_stage_seconds', 'Time spent in a job stage, per occurrence (per page request, download or PDF)',
+    ('job', 'stage')
+))
+STAGE_BYTES = REGISTRY.register(Counter(
+    'reliefweb_stage_bytes_total', 'Bytes handled by a job stage', ('job', 'stage')
+))
+JOBS = REGISTRY.register(Counter(
+    'reliefweb_jobs_total', 'Finished background jobs by outcome', ('job', 'status')
+))
+JOB_SECONDS = REGISTRY.register(Histogram(
+    'reliefweb_job_seconds', 'Wall time of finished background jobs', ('job',)
+))
+PDF_DOWNLOADS = REGISTRY.register(Counter(
+    'reliefweb_pdf_downloads_total', 'PDFs fetched by result (downloaded, reused or failed)', ('result',)
+))
+PDF_PAGES = REGISTRY.register(Counter(
+    'reliefweb_pdf_pages_total', 'PDF pages extracted'
+))
+QUEUE_JOBS = REGISTRY.register(Gauge(
+    'reliefweb_queue_jobs', 'Running and queued background jobs', ('queue', 'state')
+))
+
+
+class StageTimer:
+    """
+    Stage timings of one job.
+
+    Every timed occurrence is observed in reliefweb_stage_seconds right away and
+    summed per stage for the job's own report (summary()), which goes into job
+    status and processing_metadata. Safe to share between a job's threads.
+    """
+
+    def __init__(self, job: str):
+        """
+        Args:
+            job: Kind of job ('fetch', 'process', ...), used as the metrics' job label
+        """
+        self.job = job
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage: str, seconds: float, nbytes: Optional[int] = None):
+        """
+        Record one occurrence of a stage, with the bytes it handled if relevant.
+        """
+        STAGE_SECONDS.observe(seconds, job=self.job, stage=stage)
+        if nbytes is not None:
+            STAGE_BYTES.inc(nbytes, job=self.job, stage=stage)
+        with self._lock:
+            entry = self._stages.setdefault(stage, {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            if nbytes is not None:
+                entry['bytes'] = entry.get('bytes', 0) + nbytes
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Per-stage totals ({stage: {'count', 'seconds'[, 'bytes']}}) and the job's elapsed time so far.
+        """
+        with self._lock:
+            stages = {stage: dict(entry, seconds=round(entry['seconds'], 4)) for stage, entry in self._stages.items()}
+        return {'total_seconds': round(self.elapsed, 4), 'stages': stages}
+
+    def finish(self, status: str):
+        """
+        Count the job as finished with status ('completed' or 'error') and observe its wall time.
+        """
+        JOBS.inc(job=self.job, status=status)
+        JOB_SECONDS.observe(self.elapsed, job=self.job)
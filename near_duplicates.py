@@ -0,0 +1,170 @@
+"""
+Near-Duplicate Detection
+Groups near-identical documents (e.g. re-issued revisions of the same report) with
+MinHash signatures over word shingles and locality-sensitive hashing, so each new
+document is only compared with the few earlier documents likely to be similar.
+"""
+
+import functools
+import hashlib
+import random
+import re
+from typing import Dict, Optional, Tuple
+
+# Documents are compared as sets of overlapping word n-grams
+SHINGLE_WORDS = 5
+# MinHash signature length; LSH splits it into BANDS bands of NUM_PERM // BANDS rows.
+# 16 bands of 4 rows make documents with ~50% similarity likely to be compared,
+# comfortably below the default threshold, so few true near-duplicates are missed.
+NUM_PERM = 64
+BANDS = 16
+# Estimated Jaccard similarity at or above which a document joins an earlier one's cluster
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set:
+    """
+    Hashes of the overlapping size-word sequences of text (case-insensitive).
+    Texts shorter than size words give a single shingle; empty texts give none.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return set()
+    return {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + size]).encode('utf-8'), digest_size=4).digest(), 'big')
+        for i in range(max(1, len(words) - size + 1))
+    }
+
+
+class MinHasher:
+    """
+    MinHash over shingle hashes, using NUM_PERM universal hash functions (a*x + b) mod p.
+    The seed is fixed so signatures are comparable across runs.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingle_hashes: set) -> tuple:
+        return tuple(
+            min((a * x + b) % _MERSENNE_PRIME for x in shingle_hashes) & _MAX_HASH
+            for a, b in self.permutations
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _hasher(num_perm: int) -> MinHasher:
+    return MinHasher(num_perm)
+
+
+def text_signature(text: str, num_perm: int = NUM_PERM) -> Optional[tuple]:
+    """
+    MinHash signature of text, as NearDuplicateDetector(num_perm=num_perm) computes it,
+    or None for text without words. Lets signatures be computed where the text is
+    produced (e.g. in extraction worker processes) and passed to the detector.
+    """
+    shingle_hashes = shingles(text)
+    return _hasher(num_perm).signature(shingle_hashes) if shingle_hashes else None
+
+
+def estimated_similarity(signature_a: tuple, signature_b: tuple) -> float:
+    """
+    Estimated Jaccard similarity of two documents: the share of equal signature slots.
+    """
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+class NearDuplicateDetector:
+    """
+    Streaming greedy clustering of near-duplicates.
+
+    Documents are added in order. A document joins the cluster of the most similar
+    earlier canonical document if their estimated similarity reaches the threshold;
+    otherwise it becomes the canonical document of a new cluster. Only canonical
+    signatures are kept, and LSH buckets limit comparisons to likely matches, so
+    the cost grows roughly linearly with the number of documents.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._canonicals = []  # (key, signature) per cluster id
+        self.n_documents = 0
+        self.n_duplicates = 0
+
+    def _band_keys(self, signature: tuple):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: str, text: str, signature: Optional[tuple] = None) -> Optional[Tuple[int, float, Optional[str]]]:
+        """
+        Cluster a document.
+
+        Args:
+            key: Name of the document (e.g. its PDF filename), reported as the canonical of later duplicates
+            text: Document text
+            signature: Optional text_signature(text) computed beforehand, so text isn't hashed again
+
+        Returns:
+            Optional[tuple]: (cluster_id, similarity to the canonical document, canonical key or
+                             None if this document is the canonical one), or None if text is empty
+        """
+        if signature is None or len(signature) != self.num_perm:
+            signature = text_signature(text, self.num_perm)
+        if signature is None:
+            return None
+        self.n_documents += 1
+
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        best_cluster, best_similarity = None, 0.0
+        for cluster_id in sorted(candidates):
+            similarity = estimated_similarity(signature, self._canonicals[cluster_id][1])
+            if similarity > best_similarity:
+                best_cluster, best_similarity = cluster_id, similarity
+
+        if best_cluster is not None and best_similarity >= self.threshold:
+            self.n_duplicates += 1
+            return best_cluster, round(best_similarity, 4), self._canonicals[best_cluster][0]
+
+        cluster_id = len(self._canonicals)
+        self._canonicals.append((key, signature))
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(cluster_id)
+        return cluster_id, 1.0, None
+
+    def label(self, article: Dict, signature: Optional[tuple] = None) -> Dict:
+        """
+        Add duplicate_cluster_id, duplicate_similarity and duplicate_of to an article
+        from its pdf_text, or its precomputed signature (None for articles without PDF text).
+        """
+        result = self.add(article.get('pdf_filename', ''), article.get('pdf_text', ''), signature) \
+            if article.get('has_pdf') else None
+        cluster_id, similarity, canonical = result if result else (None, None, None)
+        article['duplicate_cluster_id'] = cluster_id
+        article['duplicate_similarity'] = similarity
+        article['duplicate_of'] = canonical
+        return article
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "documents": self.n_documents,
+            "clusters": len(self._canonicals),
+            "duplicates": self.n_duplicates
+        }
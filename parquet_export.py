@@ -0,0 +1,188 @@
+"""
+Parquet Export
+Columnar export of processed articles and their tables, written alongside the
+full-text JSON so analysts can read only the columns they need and filter on
+dates, sources or language without parsing the whole output.
+Requires the optional 'pyarrow' package.
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+# Rows buffered before a row group is written; text columns also flush the buffer
+# once it holds this many characters, so huge documents don't pile up in memory
+ARTICLE_BATCH_ROWS = 500
+ARTICLE_BATCH_CHARS = 64 * 1024 * 1024
+TABLE_CELL_BATCH_ROWS = 100_000
+
+PARQUET_COMPRESSION = 'zstd'
+
+if PARQUET_AVAILABLE:
+    ARTICLES_SCHEMA = pa.schema([
+        ("pdf_filename", pa.string()),
+        ("has_pdf", pa.bool_()),
+        ("match_type", pa.string()),
+        ("title", pa.string()),
+        ("date_created", pa.timestamp('us', tz='UTC')),
+        ("date_changed", pa.timestamp('us', tz='UTC')),
+        ("date_original", pa.timestamp('us', tz='UTC')),
+        ("url", pa.string()),
+        ("sources", pa.list_(pa.string())),
+        ("countries", pa.list_(pa.string())),
+        ("disasters", pa.list_(pa.string())),
+        ("language", pa.string()),
+        ("pdf_text_length", pa.int64()),
+        ("duplicate_cluster_id", pa.int64()),
+        ("duplicate_similarity", pa.float64()),
+        ("duplicate_of", pa.string()),
+        ("pdf_text", pa.string()),
+        ("body_text", pa.string())
+    ])
+
+    # Long format: one row per table cell
+    TABLES_SCHEMA = pa.schema([
+        ("pdf_filename", pa.string()),
+        ("page", pa.int32()),
+        ("table_number", pa.int32()),
+        ("row", pa.int32()),
+        ("col", pa.int32()),
+        ("value", pa.string())
+    ])
+
+
+def _parse_date(value) -> Optional[datetime]:
+    """
+    Parse a ReliefWeb ISO date (e.g. 2025-03-06T00:00:00+00:00); naive dates are taken as UTC.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _string_list(values) -> list:
+    return [str(v) for v in values] if isinstance(values, list) else []
+
+
+class ParquetExportWriter:
+    """
+    Streams articles and tables to <stem>.articles.parquet and <stem>.tables.parquet
+    next to output_path, one row group per batch.
+
+    Same write_article / write_tables / close / abort interface as the
+    full-text writers in pdf_processor, so it can be fed alongside them.
+    """
+
+    def __init__(self, output_path: Path):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+        output_path = Path(output_path)
+        stem = output_path.with_suffix('')
+        self.paths = {
+            "articles_parquet": stem.with_name(f"{stem.name}.articles.parquet"),
+            "tables_parquet": stem.with_name(f"{stem.name}.tables.parquet")
+        }
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._articles_writer = pq.ParquetWriter(
+            self.paths['articles_parquet'], ARTICLES_SCHEMA, compression=PARQUET_COMPRESSION
+        )
+        self._tables_writer = pq.ParquetWriter(
+            self.paths['tables_parquet'], TABLES_SCHEMA, compression=PARQUET_COMPRESSION
+        )
+        self._articles = []
+        self._article_chars = 0
+        self._cells = {name: [] for name in TABLES_SCHEMA.names}
+
+    def write_article(self, article: Dict[str, Any]):
+        date_info = article.get('date') or {}
+        row = {
+            "pdf_filename": article.get('pdf_filename', ''),
+            "has_pdf": bool(article.get('has_pdf')),
+            "match_type": article.get('match_type'),
+            "title": article.get('title', ''),
+            "date_created": _parse_date(date_info.get('created')),
+            "date_changed": _parse_date(date_info.get('changed')),
+            "date_original": _parse_date(date_info.get('original')),
+            "url": article.get('url', ''),
+            "sources": _string_list(article.get('sources')),
+            "countries": _string_list(article.get('countries')),
+            "disasters": _string_list(article.get('disasters')),
+            "language": article.get('language', ''),
+            "pdf_text_length": article.get('pdf_text_length', 0),
+            "duplicate_cluster_id": article.get('duplicate_cluster_id'),
+            "duplicate_similarity": article.get('duplicate_similarity'),
+            "duplicate_of": article.get('duplicate_of'),
+            "pdf_text": article.get('pdf_text', ''),
+            "body_text": article.get('body_text', '')
+        }
+        self._articles.append(row)
+        self._article_chars += len(row['pdf_text'] or '') + len(row['body_text'] or '')
+        if len(self._articles) >= ARTICLE_BATCH_ROWS or self._article_chars >= ARTICLE_BATCH_CHARS:
+            self._flush_articles()
+
+    def write_tables(self, pdf_filename: str, tables: list):
+        cells = self._cells
+        for table in tables:
+            for row_idx, row in enumerate(table.get('data') or []):
+                for col_idx, value in enumerate(row or []):
+                    cells['pdf_filename'].append(pdf_filename)
+                    cells['page'].append(table.get('page'))
+                    cells['table_number'].append(table.get('table_number'))
+                    cells['row'].append(row_idx)
+                    cells['col'].append(col_idx)
+                    cells['value'].append(value)
+        if len(cells['value']) >= TABLE_CELL_BATCH_ROWS:
+            self._flush_cells()
+
+    def _flush_articles(self):
+        if self._articles:
+            self._articles_writer.write_table(pa.Table.from_pylist(self._articles, schema=ARTICLES_SCHEMA))
+            self._articles = []
+            self._article_chars = 0
+
+    def _flush_cells(self):
+        if self._cells['value']:
+            self._tables_writer.write_table(pa.Table.from_pydict(self._cells, schema=TABLES_SCHEMA))
+            self._cells = {name: [] for name in TABLES_SCHEMA.names}
+
+    def close(self, processing_metadata: Dict[str, Any] = None) -> Dict[str, str]:
+        """
+        Write the remaining rows and close both files. Returns the written files by artifact name.
+        """
+        self._flush_articles()
+        self._flush_cells()
+        self._articles_writer.close()
+        self._tables_writer.close()
+        return {name: str(path) for name, path in self.paths.items()}
+
+    def abort(self):
+        """
+        Close and remove the partly written files after a failure.
+        """
+        for writer in (self._articles_writer, self._tables_writer):
+            try:
+                writer.close()
+            except Exception:
+                pass
+        for path in self.paths.values():
+            try:
+                path.unlink()
+            except OSError:
+                pass
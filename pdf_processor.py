@@ -4,104 +4,211 @@ Extracts text from PDFs and builds a structured JSON output.
 Excludes tables and image captions, keeping only body text.
 """
 
-import json
+import os
 import pdfplumber
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator
 import re
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
 
+import serialization
+from metrics import StageTimer, PDF_PAGES
+from profiler import add_worker_profile, run_in_worker, worker_profile_settings
+from near_duplicates import (NearDuplicateDetector, DEFAULT_THRESHOLD as DEFAULT_DUPLICATE_THRESHOLD,
+                             NUM_PERM, SHINGLE_WORDS, text_signature)
 
-def extract_text_from_pdf(pdf_path: Path) -> tuple:
+# Bump whenever extraction output changes, so cached results are not reused
+EXTRACTOR_VERSION = "3"
+
+
+def extraction_settings() -> Dict[str, Any]:
     """
-    Extract text from a PDF using pdfplumber, excluding tables and images.
+    Settings that determine extraction output, used to key the extraction cache
+    (which also holds the near-duplicate signature of the text).
+    """
+    return {
+        "extractor_version": EXTRACTOR_VERSION,
+        "pdfplumber_version": pdfplumber.__version__,
+        "minhash": f"{SHINGLE_WORDS}x{NUM_PERM}"
+    }
+
+
+# Table cells with at most this many words are data and are left out of the body text;
+# longer cells are usually prose laid out in a box and are kept
+TABLE_CELL_MAX_WORDS = 3
+
+# Figure/table captions and source lines, dropped from body text
+_CAPTION_LINE_RE = re.compile(
+    r'^\s*(?:(?:Figure|Fig\.?|Table|Tabella|Tbl\.?|Immagine|Image|Photo|Foto)\s*\d+|(?:Source|Fonte)\s*:)',
+    re.IGNORECASE
+)
+
+
+def _filter_lines(lines) -> str:
+    """
+    Strip text lines and drop empty, caption and source lines.
+    """
+    filtered_lines = []
+    for line in lines:
+        line = line.strip()
+        if line and not _CAPTION_LINE_RE.match(line):
+            filtered_lines.append(line)
+    return '\n'.join(filtered_lines)
+
+
+class _CellIndex:
+    """
+    Data cell bboxes bucketed into horizontal bands, so looking up the cell around
+    a word only compares it with the few cells in its band.
+    """
+
+    BAND = 20  # points
+    TOLERANCE = 1  # points a glyph box may stick out of its cell
+
+    def __init__(self, bboxes: List[tuple]):
+        self.bands = {}
+        for bbox in bboxes:
+            x0, top, x1, bottom = bbox
+            for band in range(int(top // self.BAND), int(bottom // self.BAND) + 1):
+                self.bands.setdefault(band, []).append(bbox)
+
+    def contains(self, x0: float, top: float, x1: float, bottom: float) -> bool:
+        """Whether the box lies entirely inside one cell."""
+        tol = self.TOLERANCE
+        for cx0, ctop, cx1, cbottom in self.bands.get(int((top + bottom) / 2 // self.BAND), ()):
+            if cx0 - tol <= x0 and x1 <= cx1 + tol and ctop - tol <= top and bottom <= cbottom + tol:
+                return True
+        return False
+
+
+def _lines_outside_cells(textmap, cells: _CellIndex) -> List[str]:
+    """
+    Split a page's text map into lines, leaving out table lines: those where more
+    than half of the words lie entirely inside a data cell. Other lines are kept
+    whole, so prose overlapping a cell is never cut.
+    """
+    lines = []
+    parts = []
+    words = cell_words = 0
+    first = last = None  # first and last char of the current word
+
+    for text, char in textmap.tuples:
+        if text == '\n' or char is None or text.isspace():
+            if first is not None:
+                words += 1
+                cell_words += cells.contains(first['x0'], min(first['top'], last['top']),
+                                             last['x1'], max(first['bottom'], last['bottom']))
+                first = None
+            if text == '\n':
+                if cell_words * 2 <= words:
+                    lines.append(''.join(parts))
+                parts = []
+                words = cell_words = 0
+                continue
+        elif first is None:
+            first = last = char
+        else:
+            last = char
+        parts.append(text)
+
+    if first is not None:
+        words += 1
+        cell_words += cells.contains(first['x0'], min(first['top'], last['top']),
+                                     last['x1'], max(first['bottom'], last['bottom']))
+    if cell_words * 2 <= words:
+        lines.append(''.join(parts))
+    return lines
+
+
+def _extract_pages(pdf_path: Path, pages: Optional[tuple] = None) -> tuple:
+    """
+    Extract filtered body text and tables from a PDF, page by page.
+    Errors are raised to the caller.
+
+    Tables are located once per page and their cell text is kept as table data.
+    Text lines made up mostly of words inside short (data) cells are left out of
+    the body text, while long cells are kept, since boxed page layouts are often
+    detected as tables.
 
     Args:
         pdf_path: Path to the PDF file
+        pages: Optional (first, last) 1-based inclusive page range
 
     Returns:
-        tuple: (extracted text, list of tables)
+        tuple: (list of per-page text blocks, list of tables, timings: seconds spent
+                per stage ('pdf_open', 'page_parse', 'extract_tables', 'extract_text',
+                'filter') plus the number of 'pages' extracted)
     """
     text_content = []
     all_tables = []
+    timings = {"pdf_open": 0.0, "page_parse": 0.0, "extract_tables": 0.0, "extract_text": 0.0,
+               "filter": 0.0, "pages": 0}
+
+    started = time.perf_counter()
+    with pdfplumber.open(pdf_path) as pdf:
+        first_page, last_page = pages if pages else (1, len(pdf.pages))
+        timings['pdf_open'] = time.perf_counter() - started
+        for page_num, page in enumerate(pdf.pages[first_page - 1:last_page], first_page):
+            timings['pages'] += 1
+            started = time.perf_counter()
+            # Layout objects are parsed lazily and cached; parse them up front so
+            # their cost isn't counted as table detection
+            page.objects
+            parsed = time.perf_counter()
+            timings['page_parse'] += parsed - started
+            found_tables = page.find_tables()
+            data_cells = []
+
+            for table_idx, found_table in enumerate(found_tables):
+                table = found_table.extract()
+                if table:
+                    all_tables.append({
+                        "page": page_num,
+                        "table_number": table_idx + 1,
+                        "data": table
+                    })
+
+                for row, row_text in zip(found_table.rows, table):
+                    for cell_bbox, cell_text in zip(row.cells, row_text):
+                        if cell_bbox and cell_text and len(cell_text.split()) <= TABLE_CELL_MAX_WORDS:
+                            data_cells.append(cell_bbox)
+
+            tables_done = time.perf_counter()
+            timings['extract_tables'] += tables_done - parsed
+
+            if data_cells:
+                lines = _lines_outside_cells(page.get_textmap(layout=False), _CellIndex(data_cells))
+            else:
+                lines = page.extract_text(layout=False).split('\n')
 
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                tables = page.extract_tables()
-
-                if tables:
-                    for table_idx, table in enumerate(tables):
-                        if table:
-                            all_tables.append({
-                                "page": page_num,
-                                "table_number": table_idx + 1,
-                                "data": table
-                            })
-
-                page_text = page.extract_text(layout=False)
-
-                if page_text:
-                    if tables:
-                        table_texts = set()
-                        for table in tables:
-                            if table:
-                                for row in table:
-                                    if row:
-                                        for cell in row:
-                                            if cell and isinstance(cell, str):
-                                                table_texts.add(cell.strip())
-
-                        lines = page_text.split('\n')
-                        filtered_lines = []
-
-                        for line in lines:
-                            line = line.strip()
-                            if not line:
-                                continue
-
-                            words = line.split()
-                            if words:
-                                table_word_count = sum(1 for word in words if word.strip() in table_texts)
-                                if table_word_count / len(words) > 0.5:
-                                    continue
-
-                            if re.match(
-                                r'^\s*(Figure|Fig\.?|Table|Tabella|Tbl\.?|Immagine|Image|Photo|Foto)\s*\d+',
-                                line, re.IGNORECASE
-                            ):
-                                continue
-
-                            if re.match(r'^\s*(Source|Fonte)\s*:', line, re.IGNORECASE):
-                                continue
-
-                            filtered_lines.append(line)
-
-                        if filtered_lines:
-                            text_content.append('\n'.join(filtered_lines))
-                    else:
-                        lines = page_text.split('\n')
-                        filtered_lines = []
-
-                        for line in lines:
-                            line = line.strip()
-                            if not line:
-                                continue
-
-                            if re.match(
-                                r'^\s*(Figure|Fig\.?|Table|Tabella|Tbl\.?|Immagine|Image|Photo|Foto)\s*\d+',
-                                line, re.IGNORECASE
-                            ):
-                                continue
-
-                            if re.match(r'^\s*(Source|Fonte)\s*:', line, re.IGNORECASE):
-                                continue
-
-                            filtered_lines.append(line)
-
-                        if filtered_lines:
-                            text_content.append('\n'.join(filtered_lines))
+            text_done = time.perf_counter()
+            timings['extract_text'] += text_done - tables_done
+
+            filtered_text = _filter_lines(lines)
+            if filtered_text:
+                text_content.append(filtered_text)
+
+            timings['filter'] += time.perf_counter() - text_done
+
+    return text_content, all_tables, timings
+
+
+def extract_text_from_pdf(pdf_path: Path, pages: Optional[tuple] = None) -> tuple:
+    """
+    Extract text from a PDF using pdfplumber, excluding tables and images.
+
+    Args:
+        pdf_path: Path to the PDF file
+        pages: Optional (first, last) 1-based inclusive page range
 
+    Returns:
+        tuple: (extracted text, list of tables)
+    """
+    try:
+        text_content, all_tables, _ = _extract_pages(pdf_path, pages)
     except Exception as e:
         print(f"Error extracting text from {pdf_path}: {e}")
         return "", []
@@ -109,6 +216,277 @@ def extract_text_from_pdf(pdf_path: Path) -> tuple:
     return '\n\n'.join(text_content), all_tables
 
 
+def _extract_and_sign(pdf_path: Path, pages: Optional[tuple], signature: bool) -> tuple:
+    """
+    _extract_pages, plus the near-duplicate signature of the text if signature is set
+    (timed as the 'minhash' stage).
+
+    Returns:
+        tuple: (list of per-page text blocks, list of tables, timings, signature or None)
+    """
+    text_content, all_tables, timings = _extract_pages(pdf_path, pages)
+    minhash = None
+    if signature:
+        started = time.perf_counter()
+        minhash = text_signature('\n\n'.join(text_content))
+        timings['minhash'] = time.perf_counter() - started
+    return text_content, all_tables, timings, minhash
+
+
+def _extract_task(pdf_path: Path, pages: Optional[tuple], profile_settings: Optional[tuple],
+                  signature: bool = False) -> tuple:
+    """
+    Worker process entry point: _extract_and_sign, profiled when the job is.
+
+    Returns:
+        tuple: (_extract_and_sign result, worker profile data or None)
+    """
+    return run_in_worker(profile_settings, _extract_and_sign, pdf_path, pages, signature)
+
+
+def count_pdf_pages(pdf_path: Path) -> int:
+    """
+    Count the pages of a PDF without extracting any content.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        int: Number of pages (0 if the PDF cannot be opened)
+    """
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+    except Exception as e:
+        print(f"Error reading page count from {pdf_path}: {e}")
+        return 0
+
+
+def split_page_ranges(page_count: int, pages_per_task: int) -> List[tuple]:
+    """
+    Split a document's pages into consecutive (first, last) ranges.
+
+    Args:
+        page_count: Total number of pages
+        pages_per_task: Maximum number of pages per range
+
+    Returns:
+        List[tuple]: 1-based inclusive page ranges, in page order
+    """
+    return [
+        (first, min(first + pages_per_task - 1, page_count))
+        for first in range(1, page_count + 1, pages_per_task)
+    ]
+
+
+def _record_extraction(stage_timer: StageTimer, timings: Dict[str, Any]):
+    """
+    Add the per-stage timings of one extracted PDF to a job's stage timer.
+    """
+    PDF_PAGES.inc(timings.get('pages', 0))
+    for stage, seconds in timings.items():
+        if stage != 'pages':
+            stage_timer.add(stage, seconds)
+
+
+def default_worker_count() -> int:
+    """
+    Default number of extraction worker processes (one per CPU core).
+    """
+    return os.cpu_count() or 1
+
+
+def iter_extracted_pdfs(pdf_paths: List[Path], workers: Optional[int] = None,
+                        progress_callback=None,
+                        pages_per_task: Optional[int] = None,
+                        cache=None, stage_timer: Optional[StageTimer] = None,
+                        signatures: bool = False) -> Iterator[tuple]:
+    """
+    Extract text from several PDFs, fanning them out to a pool of worker processes.
+
+    With pages_per_task set, PDFs longer than that are split into page ranges
+    that are extracted on separate workers and stitched back in page order, so
+    a single very large report does not hold up the whole job.
+
+    With a cache (see extraction_cache.ExtractionCache), PDFs whose content
+    was already extracted with the same settings are read from the cache
+    instead of being parsed again.
+
+    Results are yielded in the same order as pdf_paths, whatever order the
+    workers finish in. Only about 2 * workers tasks are submitted ahead of the
+    next PDF to yield, so results finishing early don't pile up behind a slow
+    PDF and memory stays bounded by a few documents.
+
+    With signatures set, the near-duplicate signature of each PDF's text
+    (near_duplicates.text_signature) is computed by the worker that extracted
+    it, or read from the cache, for NearDuplicateDetector.label.
+
+    Args:
+        pdf_paths: List of PDF file paths
+        workers: Number of worker processes (defaults to the number of CPU cores,
+                 1 extracts everything in the current process)
+        progress_callback: Optional callback(done, total, pdf_path) called as each PDF finishes
+        pages_per_task: Optional maximum number of pages extracted by one worker task
+        cache: Optional ExtractionCache for (text, tables) results
+        stage_timer: Optional metrics.StageTimer that receives cache lookup times and the
+                     per-PDF extraction stage times measured in the workers
+        signatures: Also compute each PDF's near-duplicate signature
+
+    Yields:
+        tuple: (index, pdf_path, extracted text, list of tables, signature or None)
+    """
+    total = len(pdf_paths)
+    if workers is None:
+        workers = default_worker_count()
+    if stage_timer is None:
+        stage_timer = StageTimer('process')
+
+    finished = {}
+    cache_keys = {}
+    done = 0
+
+    def finish(idx, result, cacheable):
+        nonlocal done
+        text, _, signature = result
+        if signatures and signature is None and text:
+            # PDFs split across workers, and cache entries written without a signature
+            with stage_timer.time('minhash'):
+                result = result[:2] + (text_signature(text),)
+        finished[idx] = result
+        if cacheable and cache is not None and idx in cache_keys:
+            cache.put(cache_keys[idx], *result)
+        done += 1
+        if progress_callback:
+            progress_callback(done, total, pdf_paths[idx])
+
+    # Serve what we can from the cache
+    if cache is not None:
+        settings = extraction_settings()
+        for idx, pdf_path in enumerate(pdf_paths):
+            with stage_timer.time('cache_lookup'):
+                try:
+                    cache_keys[idx] = cache.key_for(pdf_path, settings)
+                except OSError as e:
+                    print(f"Warning: could not hash {pdf_path} for the extraction cache: {e}")
+                    continue
+                cached = cache.get(cache_keys[idx])
+            if cached is not None:
+                finish(idx, cached, cacheable=False)
+
+    # Plan the work units: one per PDF, or one per page range for long PDFs
+    tasks = []
+    for idx, pdf_path in enumerate(pdf_paths):
+        if idx in finished:
+            continue
+        ranges = [None]
+        if pages_per_task and workers > 1:
+            page_count = count_pdf_pages(pdf_path)
+            if page_count > pages_per_task:
+                ranges = split_page_ranges(page_count, pages_per_task)
+        tasks.extend((idx, part, page_range) for part, page_range in enumerate(ranges))
+
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers == 1:
+        for idx, pdf_path in enumerate(pdf_paths):
+            if idx not in finished:
+                try:
+                    text_content, pdf_tables, timings, signature = _extract_and_sign(pdf_path, None, signatures)
+                    _record_extraction(stage_timer, timings)
+                    finish(idx, ('\n\n'.join(text_content), pdf_tables, signature), cacheable=True)
+                except Exception as e:
+                    print(f"Error extracting text from {pdf_path}: {e}")
+                    finish(idx, ("", [], None), cacheable=False)
+            pdf_text, pdf_tables, signature = finished.pop(idx)
+            yield idx, pdf_path, pdf_text, pdf_tables, signature
+        return
+
+    parts_left = {}
+    for idx, _, _ in tasks:
+        parts_left[idx] = parts_left.get(idx, 0) + 1
+    task_counts = dict(parts_left)
+
+    next_idx = 0
+    # Tasks submitted for PDFs not yielded yet (running, or finished and waiting their turn)
+    outstanding = 0
+
+    def flush():
+        # Hand results back in input order
+        nonlocal next_idx, outstanding
+        while next_idx in finished:
+            pdf_text, pdf_tables, signature = finished.pop(next_idx)
+            outstanding -= task_counts.get(next_idx, 0)
+            yield next_idx, pdf_paths[next_idx], pdf_text, pdf_tables, signature
+            next_idx += 1
+
+    yield from flush()
+
+    # Extraction is profiled inside the workers when this runs in a profiled job
+    profile_settings = worker_profile_settings()
+    window = 2 * workers
+
+    # 'spawn' keeps workers safe to start from the server's threads
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+        futures = {}
+        next_task = 0
+
+        def submit_more():
+            # The next PDF's own page ranges always go in, however many there are
+            nonlocal next_task, outstanding
+            while next_task < len(tasks):
+                idx, part, page_range = tasks[next_task]
+                if outstanding >= window and idx != next_idx:
+                    break
+                # Split PDFs are signed once stitched together
+                future = executor.submit(_extract_task, pdf_paths[idx], page_range, profile_settings,
+                                         signatures and page_range is None)
+                futures[future] = (idx, part)
+                next_task += 1
+                outstanding += 1
+
+        submit_more()
+        parts = {}
+        failed = set()
+        while futures:
+            done_futures, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done_futures:
+                idx, part = futures.pop(future)
+                try:
+                    result, worker_profile = future.result()
+                    add_worker_profile(worker_profile)
+                    parts.setdefault(idx, {})[part] = result
+                except Exception as e:
+                    if idx not in failed:
+                        print(f"Error extracting text from {pdf_paths[idx]}: {e}")
+                    failed.add(idx)
+
+                parts_left[idx] -= 1
+                if parts_left[idx]:
+                    continue
+
+                # Every range of this PDF is in: stitch text and tables in page order
+                pdf_parts = parts.pop(idx, {})
+                if idx in failed:
+                    finish(idx, ("", [], None), cacheable=False)
+                else:
+                    text_content = []
+                    all_tables = []
+                    timings = {}
+                    signature = None
+                    for part in sorted(pdf_parts):
+                        part_text, part_tables, part_timings, signature = pdf_parts[part]
+                        text_content.extend(part_text)
+                        all_tables.extend(part_tables)
+                        for stage, value in part_timings.items():
+                            timings[stage] = timings.get(stage, 0) + value
+                    _record_extraction(stage_timer, timings)
+                    finish(idx, ('\n\n'.join(text_content), all_tables, signature), cacheable=True)
+
+            yield from flush()
+            submit_more()
+
+
 def find_pdf_files(directory: Path) -> List[Path]:
     """
     Find all PDF files in a directory (including subdirectories).
@@ -129,11 +507,108 @@ def find_pdf_files(directory: Path) -> List[Path]:
     return sorted(set(pdf_files))
 
 
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+class ReportIndex:
+    """
+    Lookup tables for matching PDF filenames to reports, built once per job.
+
+    match() runs the same passes in the same order as a linear scan would
+    (exact saved filename, name without extension, ID prefix, reliefweb_id,
+    partial title) and returns the same report, but every pass except the
+    fuzzy title one is a hash lookup.
+    """
+
+    def __init__(self, reports: List[Dict]):
+        """
+        Args:
+            reports: List of reports from the JSON
+        """
+        self.by_saved_name = {}
+        self.by_base_name = {}
+        self.by_id_segment = {}
+        self.by_reliefweb_id = {}
+        self.normalized_titles = []
+
+        # setdefault keeps the first report in list order, as a linear scan would
+        for report in reports:
+            for file_info in report.get('files', []):
+                saved_filename = file_info.get('saved_filename', '') or file_info.get('filename', '')
+                if not saved_filename:
+                    continue
+                saved_lower = saved_filename.lower()
+                self.by_saved_name.setdefault(saved_lower, report)
+                self.by_base_name.setdefault(saved_filename.replace('.pdf', '').lower(), report)
+                # Saved names sharing the first '_' segment, for the ID prefix pass
+                self.by_id_segment.setdefault(saved_lower.split('_', 1)[0], []).append((saved_lower, report))
+
+            reliefweb_id = str(report.get('reliefweb_id', ''))
+            if reliefweb_id:
+                self.by_reliefweb_id.setdefault(reliefweb_id, report)
+
+            if 'title' in report:
+                self.normalized_titles.append((_NON_ALNUM_RE.sub('', str(report['title']).lower()), report))
+
+    def match(self, pdf_filename: str) -> tuple:
+        """
+        Match a PDF file to its corresponding report based on filename.
+
+        Args:
+            pdf_filename: Name of the PDF file
+
+        Returns:
+            tuple: (matching report or None, name of the pass that matched:
+                    'exact_match', 'partial_match', 'id_match',
+                    'reliefweb_id_match', 'title_match' or 'no_match')
+        """
+        pdf_name_lower = pdf_filename.lower()
+
+        # Pass 1: exact match on saved_filename
+        report = self.by_saved_name.get(pdf_name_lower)
+        if report is not None:
+            return report, 'exact_match'
+
+        # Pass 2: match without extension
+        report = self.by_base_name.get(pdf_name_lower.replace('.pdf', ''))
+        if report is not None:
+            return report, 'partial_match'
+
+        # Pass 3: match using ID prefix
+        pdf_parts = pdf_filename.replace('.pdf', '').split('_')
+        if len(pdf_parts) >= 2:
+            pdf_id_prefix = f"{pdf_parts[0]}_{pdf_parts[1]}".lower()
+            for saved_lower, report in self.by_id_segment.get(pdf_parts[0].lower(), []):
+                if saved_lower.startswith(pdf_id_prefix):
+                    return report, 'id_match'
+
+        # Pass 4: match using reliefweb_id
+        report = self.by_reliefweb_id.get(pdf_parts[0])
+        if report is not None:
+            return report, 'reliefweb_id_match'
+
+        # Pass 5: partial title match (fallback)
+        if len(pdf_parts) >= 3:
+            base_name_no_id = '_'.join(pdf_parts[2:]).lower()
+        else:
+            base_name_no_id = pdf_filename.replace('.pdf', '').lower()
+
+        name_normalized = _NON_ALNUM_RE.sub('', base_name_no_id)
+        if len(name_normalized) > 10:
+            for title_normalized, report in self.normalized_titles:
+                if name_normalized in title_normalized or title_normalized in name_normalized:
+                    return report, 'title_match'
+
+        return None, 'no_match'
+
+
 def match_pdf_to_report(pdf_filename: str, reports: List[Dict]) -> Optional[Dict]:
     """
     Match a PDF file to its corresponding report based on filename.
     Uses the 'saved_filename' field inside 'files' for matching.
 
+    For many PDFs against the same reports, build a ReportIndex once instead.
+
     Args:
         pdf_filename: Name of the PDF file
         reports: List of reports from the JSON
@@ -141,66 +616,344 @@ def match_pdf_to_report(pdf_filename: str, reports: List[Dict]) -> Optional[Dict
     Returns:
         Optional[Dict]: Matching report or None
     """
-    pdf_name_lower = pdf_filename.lower()
+    return ReportIndex(reports).match(pdf_filename)[0]
 
-    # Pass 1: exact match on saved_filename
-    for report in reports:
-        files = report.get('files', [])
-        for file_info in files:
-            saved_filename = file_info.get('saved_filename', '') or file_info.get('filename', '')
-            if saved_filename and saved_filename.lower() == pdf_name_lower:
-                return report
 
-    # Pass 2: match without extension
+def report_key(report: Dict) -> tuple:
+    """
+    Identity of a report for de-duplication: its reliefweb_id, or its title if it has none.
+    """
+    reliefweb_id = report.get('reliefweb_id')
+    if reliefweb_id not in (None, ''):
+        return ('reliefweb_id', str(reliefweb_id))
+    return ('title', report.get('title', ''))
+
+
+def articles_without_pdfs(reports: List[Dict], matched_keys: set) -> Iterator[Dict]:
+    """
+    Build articles for the reports that no PDF was matched to.
+
+    Args:
+        reports: List of reports from the JSON
+        matched_keys: report_key() of every report matched to a PDF;
+                      reports are added to it as they are emitted
+
+    Yields:
+        Dict: Article without PDF text, one per distinct unmatched report
+    """
     for report in reports:
-        files = report.get('files', [])
-        for file_info in files:
-            saved_filename = file_info.get('saved_filename', '') or file_info.get('filename', '')
-            if saved_filename:
-                saved_base = saved_filename.replace('.pdf', '').lower()
-                pdf_base = pdf_name_lower.replace('.pdf', '').lower()
-                if saved_base == pdf_base:
-                    return report
-
-    # Pass 3: match using ID prefix
-    pdf_parts = pdf_filename.replace('.pdf', '').split('_')
-    if len(pdf_parts) >= 2:
-        pdf_id_prefix = f"{pdf_parts[0]}_{pdf_parts[1]}"
-        for report in reports:
-            files = report.get('files', [])
-            for file_info in files:
-                saved_filename = file_info.get('saved_filename', '') or file_info.get('filename', '')
-                if saved_filename and saved_filename.lower().startswith(pdf_id_prefix.lower()):
-                    return report
+        key = report_key(report)
+        if key in matched_keys:
+            continue
+        matched_keys.add(key)
+
+        sources = report.get('sources', report.get('source', []))
+        if isinstance(sources, list) and sources and isinstance(sources[0], dict):
+            source_names = [s.get('name', '') for s in sources]
+        else:
+            source_names = sources if isinstance(sources, list) else []
+
+        countries = report.get('countries', [])
+        if isinstance(countries, list) and countries and isinstance(countries[0], dict):
+            country_names = [c.get('name', '') for c in countries]
+        else:
+            country_names = countries if isinstance(countries, list) else []
+
+        disasters = report.get('disasters', [])
+        if isinstance(disasters, list) and disasters and isinstance(disasters[0], dict):
+            disaster_names = [d.get('name', '') for d in disasters]
+        else:
+            disaster_names = disasters if isinstance(disasters, list) else []
+
+        language = report.get('language', {})
+        language_name = language.get('name', '') if isinstance(language, dict) else str(language)
+
+        date_info = report.get('date', {})
+
+        yield {
+            "pdf_filename": "",
+            "has_pdf": False,
+            "pdf_text": "",
+            "pdf_text_length": 0,
+            "title": report.get('title', ''),
+            "date": {
+                "created": date_info.get('created', ''),
+                "changed": date_info.get('changed', ''),
+                "original": date_info.get('original', '')
+            },
+            "url": report.get('url', report.get('url_alias', '')),
+            "sources": source_names,
+            "countries": country_names,
+            "disasters": disaster_names,
+            "language": language_name,
+            "body_text": report.get('body_text', report.get('content', {}).get('body_text', ''))
+        }
 
-    # Pass 4: match using reliefweb_id
-    if len(pdf_parts) >= 1:
-        potential_id = pdf_parts[0]
-        for report in reports:
-            reliefweb_id = str(report.get('reliefweb_id', ''))
-            if reliefweb_id and reliefweb_id == potential_id:
-                return report
 
-    # Pass 5: partial title match (fallback)
-    base_name = pdf_filename.replace('.pdf', '').lower()
-    if len(pdf_parts) >= 3:
-        base_name_no_id = '_'.join(pdf_parts[2:]).lower()
+def output_header(source_data: Dict) -> Dict[str, Any]:
+    """
+    Event fields at the top of the full-text output, taken from the source JSON.
+    """
+    emdat_event = source_data.get('emdat_event', {})
+    return {
+        "DisNo": emdat_event.get('DisNo', ''),
+        "disaster_type": emdat_event.get('disaster_type', source_data.get('disaster', '')),
+        "country": emdat_event.get('country', source_data.get('country', '')),
+        "iso2": emdat_event.get('iso2', source_data.get('country_code', '')),
+        "location": emdat_event.get('location', ''),
+        "start_dt": emdat_event.get('start_dt', ''),
+        "query": emdat_event.get('query', source_data.get('disaster', ''))
+    }
+
+
+def pdf_article(pdf_filename: str, pdf_text: str, match_type: str, matched_report: Optional[Dict]) -> Dict[str, Any]:
+    """
+    Build the article for an extracted PDF, filled in from its matched report if any.
+    """
+    article = {
+        "pdf_filename": pdf_filename,
+        "has_pdf": True,
+        "pdf_text": pdf_text,
+        "pdf_text_length": len(pdf_text),
+        "match_type": match_type
+    }
+
+    if matched_report:
+        sources = matched_report.get('sources', matched_report.get('source', []))
+        if isinstance(sources, list) and sources and isinstance(sources[0], dict):
+            source_names = [s.get('name', '') for s in sources]
+        else:
+            source_names = sources if isinstance(sources, list) else []
+
+        language = matched_report.get('language', {})
+        language_name = language.get('name', '') if isinstance(language, dict) else str(language)
+
+        date_info = matched_report.get('date', {})
+
+        article.update({
+            "title": matched_report.get('title', ''),
+            "date": {
+                "created": date_info.get('created', ''),
+                "changed": date_info.get('changed', ''),
+                "original": date_info.get('original', '')
+            },
+            "url": matched_report.get('url', ''),
+            "sources": source_names,
+            "language": language_name,
+            "body_text": matched_report.get('body_text', matched_report.get('content', {}).get('body_text', ''))
+        })
     else:
-        base_name_no_id = base_name
+        article.update({
+            "title": "",
+            "date": {"created": "", "changed": "", "original": ""},
+            "url": "",
+            "sources": [],
+            "language": "",
+            "body_text": ""
+        })
 
-    for report in reports:
-        if 'title' in report:
-            title_normalized = re.sub(r'[^a-z0-9]+', '', report['title'].lower())
-            name_normalized = re.sub(r'[^a-z0-9]+', '', base_name_no_id)
-            if len(name_normalized) > 10:
-                if name_normalized in title_normalized or title_normalized in name_normalized:
-                    return report
+    return article
+
+
+OUTPUT_FORMATS = ('json', 'jsonl')
+
+
+class JsonOutputWriter:
+    """
+    Writes the full-text output as a single JSON document.
+
+    Articles and tables are held in memory until close(), since the
+    document is only written once it is complete.
+    """
 
-    return None
+    def __init__(self, output_path: Path, header: Dict[str, Any],
+                 compact: bool = False, compression: Optional[str] = None):
+        self.output_path = Path(output_path)
+        self.header = header
+        self.compact = compact
+        self.compression = serialization.check_compression(compression)
+        self.n_documents = 0
+        self.articles_with_pdf = 0
+        self._articles = []
+        self._tables = []
+
+    def write_article(self, article: Dict[str, Any]):
+        self.n_documents += 1
+        if article.get('has_pdf'):
+            self.articles_with_pdf += 1
+        self._articles.append(article)
+
+    def write_tables(self, pdf_filename: str, tables: list):
+        self._tables.append({"pdf_filename": pdf_filename, "tables": tables})
+
+    def close(self, processing_metadata: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Write the output. Returns the written files by artifact name.
+        """
+        output = dict(self.header)
+        output['articles'] = self._articles
+        output['n_documents'] = self.n_documents
+        output['pdf_tables'] = self._tables
+        output['processing_metadata'] = processing_metadata
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        written = serialization.dump(output, self.output_path, self.compact, self.compression)
+        return {"json": str(written)}
+
+    def abort(self):
+        self._articles = []
+        self._tables = []
+
+
+class JsonlOutputWriter:
+    """
+    Streams the full-text output as JSON Lines next to output_path:
+
+      <stem>.articles.jsonl  one article per line, written as each PDF finishes
+      <stem>.tables.jsonl    one {"pdf_filename", "tables"} record per PDF with tables
+      <stem>.manifest.json   event header, n_documents, file names and processing_metadata
+
+    The two .jsonl files get the compression suffix (.gz/.zst) when compressed;
+    the manifest is small and always written plain.
+    Only the article being written is held in memory.
+    """
+
+    def __init__(self, output_path: Path, header: Dict[str, Any],
+                 compact: bool = False, compression: Optional[str] = None):
+        output_path = Path(output_path)
+        stem = output_path.with_suffix('')
+        self.compact = compact
+        self.compression = serialization.check_compression(compression)
+        self.paths = {
+            "articles": serialization.compressed_path(stem.with_name(f"{stem.name}.articles.jsonl"), self.compression),
+            "tables": serialization.compressed_path(stem.with_name(f"{stem.name}.tables.jsonl"), self.compression),
+            "manifest": stem.with_name(f"{stem.name}.manifest.json")
+        }
+        self.header = header
+        self.n_documents = 0
+        self.articles_with_pdf = 0
+        self.n_table_records = 0
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._articles_file = serialization.open_output(self.paths['articles'], self.compression)
+        self._tables_file = serialization.open_output(self.paths['tables'], self.compression)
+
+    def write_article(self, article: Dict[str, Any]):
+        self.n_documents += 1
+        if article.get('has_pdf'):
+            self.articles_with_pdf += 1
+        self._articles_file.write(serialization.dumps_line(article))
+
+    def write_tables(self, pdf_filename: str, tables: list):
+        self.n_table_records += 1
+        self._tables_file.write(serialization.dumps_line({"pdf_filename": pdf_filename, "tables": tables}))
+
+    def close(self, processing_metadata: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Finish the JSONL files and write the manifest. Returns the written files by artifact name.
+        """
+        self._articles_file.close()
+        self._tables_file.close()
+
+        manifest = dict(self.header)
+        manifest['n_documents'] = self.n_documents
+        manifest['n_table_records'] = self.n_table_records
+        manifest['articles_file'] = self.paths['articles'].name
+        manifest['tables_file'] = self.paths['tables'].name
+        manifest['processing_metadata'] = processing_metadata
+        serialization.dump(manifest, self.paths['manifest'], self.compact)
+
+        return {name: str(path) for name, path in self.paths.items()}
+
+    def abort(self):
+        """
+        Close and remove the partly written files after a failure.
+        """
+        self._articles_file.close()
+        self._tables_file.close()
+        for path in self.paths.values():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+class OutputFanout:
+    """
+    Feeds the same articles and tables to a full-text writer and extra exports.
+    The article counters are those of the full-text writer.
+    """
+
+    def __init__(self, writer, exports: list):
+        self.writer = writer
+        self.exports = exports
+
+    @property
+    def n_documents(self):
+        return self.writer.n_documents
+
+    @property
+    def articles_with_pdf(self):
+        return self.writer.articles_with_pdf
+
+    def write_article(self, article: Dict[str, Any]):
+        self.writer.write_article(article)
+        for export in self.exports:
+            export.write_article(article)
+
+    def write_tables(self, pdf_filename: str, tables: list):
+        self.writer.write_tables(pdf_filename, tables)
+        for export in self.exports:
+            export.write_tables(pdf_filename, tables)
+
+    def close(self, processing_metadata: Dict[str, Any]) -> Dict[str, str]:
+        output_files = self.writer.close(processing_metadata)
+        for export in self.exports:
+            output_files.update(export.close(processing_metadata))
+        return output_files
+
+    def abort(self):
+        for writer in [self.writer] + self.exports:
+            writer.abort()
+
+
+def create_output_writer(output_format: str, output_path: Path, header: Dict[str, Any],
+                         compact: bool = False, compression: Optional[str] = None,
+                         parquet: bool = False, exports: Optional[list] = None):
+    """
+    Build the writer for an output format ('json' or 'jsonl').
+
+    compact writes JSON without indentation; compression ('gzip' or 'zstd')
+    compresses the output files and adds the matching suffix. parquet also
+    writes the Parquet export (see parquet_export.ParquetExportWriter), and
+    exports are further writers fed the same articles (e.g. a search index).
+    """
+    if output_format == 'json':
+        writer = JsonOutputWriter(output_path, header, compact, compression)
+    elif output_format == 'jsonl':
+        writer = JsonlOutputWriter(output_path, header, compact, compression)
+    else:
+        raise ValueError(f"Unknown output format '{output_format}' (expected one of {', '.join(OUTPUT_FORMATS)})")
+
+    exports = list(exports or [])
+    if parquet:
+        from parquet_export import ParquetExportWriter
+        try:
+            exports.insert(0, ParquetExportWriter(output_path))
+        except BaseException:
+            writer.abort()
+            raise
+    return OutputFanout(writer, exports) if exports else writer
 
 
 def process_pdfs(source_json_path: str, pdf_directory: str, output_json_path: str,
-                 progress_callback=None) -> Dict[str, Any]:
+                 progress_callback=None, workers: Optional[int] = None,
+                 pages_per_task: Optional[int] = None, cache=None,
+                 output_format: str = 'json', compact: bool = False,
+                 compression: Optional[str] = None, parquet: bool = False,
+                 search_index=None,
+                 duplicate_threshold: Optional[float] = DEFAULT_DUPLICATE_THRESHOLD,
+                 stage_timer: Optional[StageTimer] = None) -> Dict[str, Any]:
     """
     Main processing function. Extracts text from PDFs and builds structured JSON.
 
@@ -209,6 +962,21 @@ def process_pdfs(source_json_path: str, pdf_directory: str, output_json_path: st
         pdf_directory: Path to the directory containing PDFs
         output_json_path: Path where the output JSON will be saved
         progress_callback: Optional callback(percent, message) for progress updates
+        workers: Number of extraction worker processes (defaults to the number of CPU cores)
+        pages_per_task: Optional page count above which a PDF is split across workers
+        cache: Optional extraction_cache.ExtractionCache to reuse earlier extraction results
+        output_format: 'json' for a single JSON document, or 'jsonl' to stream articles
+                       and tables to JSON Lines files next to output_json_path (see JsonlOutputWriter)
+        compact: Write JSON without indentation
+        compression: Optional 'gzip' or 'zstd' compression of the output (adds .gz/.zst)
+        parquet: Also write <stem>.articles.parquet and <stem>.tables.parquet (requires pyarrow)
+        search_index: Optional search_index.SearchIndex to add the articles to, as the corpus
+                      named after the source JSON's folder
+        duplicate_threshold: Similarity at which a PDF is labelled a near-duplicate of an earlier
+                             one (duplicate_cluster_id / duplicate_similarity / duplicate_of);
+                             None skips near-duplicate detection
+        stage_timer: Optional metrics.StageTimer for the per-stage timings (one is created
+                     if not given); they are added to processing_metadata as stage_timings
 
     Returns:
         Dict with processing results summary
@@ -222,29 +990,18 @@ def process_pdfs(source_json_path: str, pdf_directory: str, output_json_path: st
             progress_callback(percent, message)
         print(f"  [{percent}%] {message}")
 
+    if stage_timer is None:
+        stage_timer = StageTimer('process')
+
     report_progress(0, "Loading source JSON...")
 
     # Load source JSON
     try:
-        with open(source_json_path, 'r', encoding='utf-8') as f:
-            source_data = json.load(f)
+        with stage_timer.time('load_source'), open(source_json_path, 'rb') as f:
+            source_data = serialization.loads(f.read())
     except Exception as e:
         raise RuntimeError(f"Failed to load source JSON: {e}")
 
-    # Extract base info
-    emdat_event = source_data.get('emdat_event', {})
-
-    output = {
-        "DisNo": emdat_event.get('DisNo', ''),
-        "disaster_type": emdat_event.get('disaster_type', source_data.get('disaster', '')),
-        "country": emdat_event.get('country', source_data.get('country', '')),
-        "iso2": emdat_event.get('iso2', source_data.get('country_code', '')),
-        "location": emdat_event.get('location', ''),
-        "start_dt": emdat_event.get('start_dt', ''),
-        "query": emdat_event.get('query', source_data.get('disaster', '')),
-        "articles": []
-    }
-
     # Find PDFs
     report_progress(5, "Scanning for PDF files...")
     pdf_files = find_pdf_files(pdf_directory)
@@ -252,9 +1009,10 @@ def process_pdfs(source_json_path: str, pdf_directory: str, output_json_path: st
     report_progress(10, f"Found {total_pdfs} PDF files")
 
     reports = source_data.get('reports', [])
+    report_index = ReportIndex(reports)
+    matched_keys = set()
 
     # Process each PDF
-    pdf_tables_collection = []
     matching_stats = {
         "exact_match": 0,
         "partial_match": 0,
@@ -264,173 +1022,82 @@ def process_pdfs(source_json_path: str, pdf_directory: str, output_json_path: st
         "no_match": 0
     }
 
-    for idx, pdf_path in enumerate(pdf_files):
-        percent = 10 + int((idx / max(total_pdfs, 1)) * 70)
-        report_progress(percent, f"Processing PDF {idx + 1}/{total_pdfs}: {pdf_path.name[:50]}...")
-
-        pdf_text, pdf_tables = extract_text_from_pdf(pdf_path)
-
-        if pdf_tables:
-            pdf_tables_collection.append({
-                "pdf_filename": pdf_path.name,
-                "tables": pdf_tables
-            })
+    def report_extracted(done, total, pdf_path):
+        percent = 10 + int((done / max(total, 1)) * 70)
+        report_progress(percent, f"Extracted PDF {done}/{total}: {pdf_path.name[:50]}...")
 
-        matched_report = match_pdf_to_report(pdf_path.name, reports)
+    detector = NearDuplicateDetector(duplicate_threshold) if duplicate_threshold is not None else None
 
-        article = {
-            "pdf_filename": pdf_path.name,
-            "has_pdf": True,
-            "pdf_text": pdf_text,
-            "pdf_text_length": len(pdf_text)
+    header = output_header(source_data)
+    exports = [search_index.corpus_indexer(source_json_path.parent.name, header)] if search_index else []
+    writer = create_output_writer(output_format, output_json_path, header,
+                                  compact, compression, parquet, exports)
+    try:
+        for idx, pdf_path, pdf_text, pdf_tables, signature in iter_extracted_pdfs(
+                pdf_files, workers, report_extracted, pages_per_task, cache, stage_timer,
+                signatures=detector is not None):
+            if pdf_tables:
+                with stage_timer.time('write'):
+                    writer.write_tables(pdf_path.name, pdf_tables)
+
+            with stage_timer.time('matching'):
+                matched_report, match_type = report_index.match(pdf_path.name)
+            matching_stats[match_type] += 1
+            if matched_report:
+                matched_keys.add(report_key(matched_report))
+
+            article = pdf_article(pdf_path.name, pdf_text, match_type, matched_report)
+            if detector is not None:
+                with stage_timer.time('near_duplicates'):
+                    detector.label(article, signature)
+            with stage_timer.time('write'):
+                writer.write_article(article)
+
+        # Add reports without PDFs
+        report_progress(82, "Adding reports without PDFs...")
+        for article in articles_without_pdfs(reports, matched_keys):
+            if detector is not None:
+                detector.label(article)
+            with stage_timer.time('write'):
+                writer.write_article(article)
+
+        processing_metadata = {
+            "processing_date": datetime.now().isoformat(),
+            "source_json": str(source_json_path),
+            "pdf_directory": str(pdf_directory),
+            "total_pdfs_found": total_pdfs,
+            "total_reports": len(reports),
+            "matching_statistics": matching_stats
         }
-
-        if matched_report:
-            # Determine match type for stats
-            files = matched_report.get('files', [])
-            exact = False
-            for fi in files:
-                sf = fi.get('saved_filename', '') or fi.get('filename', '')
-                if sf.lower() == pdf_path.name.lower():
-                    exact = True
-                    matching_stats["exact_match"] += 1
-                    break
-            if not exact:
-                pdf_parts = pdf_path.name.replace('.pdf', '').split('_')
-                if len(pdf_parts) >= 1 and pdf_parts[0] == str(matched_report.get('reliefweb_id', '')):
-                    matching_stats["reliefweb_id_match"] += 1
-                else:
-                    matching_stats["title_match"] += 1
-
-            sources = matched_report.get('sources', matched_report.get('source', []))
-            if isinstance(sources, list) and sources and isinstance(sources[0], dict):
-                source_names = [s.get('name', '') for s in sources]
-            else:
-                source_names = sources if isinstance(sources, list) else []
-
-            countries = matched_report.get('countries', [])
-            if isinstance(countries, list) and countries and isinstance(countries[0], dict):
-                country_names = [c.get('name', '') for c in countries]
-            else:
-                country_names = countries if isinstance(countries, list) else []
-
-            disasters = matched_report.get('disasters', [])
-            if isinstance(disasters, list) and disasters and isinstance(disasters[0], dict):
-                disaster_names = [d.get('name', '') for d in disasters]
-            else:
-                disaster_names = disasters if isinstance(disasters, list) else []
-
-            language = matched_report.get('language', {})
-            language_name = language.get('name', '') if isinstance(language, dict) else str(language)
-
-            date_info = matched_report.get('date', {})
-
-            article.update({
-                "title": matched_report.get('title', ''),
-                "date": {
-                    "created": date_info.get('created', ''),
-                    "changed": date_info.get('changed', ''),
-                    "original": date_info.get('original', '')
-                },
-                "url": matched_report.get('url', ''),
-                "sources": source_names,
-                "language": language_name,
-                "body_text": matched_report.get('body_text', matched_report.get('content', {}).get('body_text', ''))
-            })
-        else:
-            matching_stats["no_match"] += 1
-            article.update({
-                "title": "",
-                "date": {"created": "", "changed": "", "original": ""},
-                "url": "",
-                "sources": [],
-                "language": "",
-                "body_text": ""
-            })
-
-        output['articles'].append(article)
-
-    # Add reports without PDFs
-    report_progress(82, "Adding reports without PDFs...")
-    for report in reports:
-        report_title = report.get('title', '')
-        already_processed = any(
-            article.get('title') == report_title
-            for article in output['articles']
-        )
-
-        if not already_processed:
-            sources = report.get('sources', report.get('source', []))
-            if isinstance(sources, list) and sources and isinstance(sources[0], dict):
-                source_names = [s.get('name', '') for s in sources]
-            else:
-                source_names = sources if isinstance(sources, list) else []
-
-            countries = report.get('countries', [])
-            if isinstance(countries, list) and countries and isinstance(countries[0], dict):
-                country_names = [c.get('name', '') for c in countries]
-            else:
-                country_names = countries if isinstance(countries, list) else []
-
-            disasters = report.get('disasters', [])
-            if isinstance(disasters, list) and disasters and isinstance(disasters[0], dict):
-                disaster_names = [d.get('name', '') for d in disasters]
-            else:
-                disaster_names = disasters if isinstance(disasters, list) else []
-
-            language = report.get('language', {})
-            language_name = language.get('name', '') if isinstance(language, dict) else str(language)
-
-            date_info = report.get('date', {})
-
-            article = {
-                "pdf_filename": "",
-                "has_pdf": False,
-                "pdf_text": "",
-                "pdf_text_length": 0,
-                "title": report.get('title', ''),
-                "date": {
-                    "created": date_info.get('created', ''),
-                    "changed": date_info.get('changed', ''),
-                    "original": date_info.get('original', '')
-                },
-                "url": report.get('url', report.get('url_alias', '')),
-                "sources": source_names,
-                "countries": country_names,
-                "disasters": disaster_names,
-                "language": language_name,
-                "body_text": report.get('body_text', report.get('content', {}).get('body_text', ''))
-            }
-            output['articles'].append(article)
-
-    output['n_documents'] = len(output['articles'])
-    output['pdf_tables'] = pdf_tables_collection
-
-    output['processing_metadata'] = {
-        "processing_date": datetime.now().isoformat(),
-        "source_json": str(source_json_path),
-        "pdf_directory": str(pdf_directory),
-        "total_pdfs_found": total_pdfs,
-        "total_reports": len(reports),
-        "matching_statistics": matching_stats
-    }
-
-    # Save output JSON
-    report_progress(90, "Saving output JSON...")
-    output_json_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_json_path, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-
-    articles_with_pdf = sum(1 for a in output['articles'] if a.get('has_pdf'))
-    articles_without_pdf = sum(1 for a in output['articles'] if not a.get('has_pdf'))
+        if cache is not None:
+            processing_metadata['cache_statistics'] = cache.stats()
+        if detector is not None:
+            processing_metadata['near_duplicate_statistics'] = detector.stats()
+        # Timings up to here; writing the output itself is only in the returned summary
+        processing_metadata['stage_timings'] = stage_timer.summary()
+
+        # Save output
+        report_progress(90, "Saving output JSON...")
+        with stage_timer.time('serialization'):
+            output_files = writer.close(processing_metadata)
+    except BaseException:
+        writer.abort()
+        stage_timer.finish('error')
+        raise
+    stage_timer.finish('completed')
 
     report_progress(100, "Processing complete!")
 
     return {
-        "output_path": str(output_json_path),
-        "total_articles": output['n_documents'],
-        "articles_with_pdf": articles_with_pdf,
-        "articles_without_pdf": articles_without_pdf,
+        "output_path": output_files['json'] if output_format == 'json' else output_files['manifest'],
+        "output_format": output_format,
+        "output_files": output_files,
+        "total_articles": writer.n_documents,
+        "articles_with_pdf": writer.articles_with_pdf,
+        "articles_without_pdf": writer.n_documents - writer.articles_with_pdf,
         "total_pdfs_processed": total_pdfs,
-        "matching_statistics": matching_stats
+        "matching_statistics": matching_stats,
+        "cache_statistics": cache.stats() if cache is not None else None,
+        "near_duplicate_statistics": detector.stats() if detector is not None else None,
+        "stage_timings": stage_timer.summary()
     }
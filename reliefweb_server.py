@@ -3,26 +3,299 @@ Flask server for ReliefWeb document fetcher
 Provides API endpoints for fetching disaster reports, downloading PDFs,
 and processing PDFs to extract text.
 """
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory, stream_with_context
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
-import zipfile
-from datetime import datetime
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+import random
 import threading
+import time
 import shutil
 import tempfile
 import uuid
+import mimetypes
+
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+
+from job_store import create_job_store, FINISHED_STATUSES
+from job_scheduler import JobScheduler, QueueFullError
+import metrics
+import serialization
+from metrics import StageTimer
+from profiler import PROFILE_EXTENSIONS, parse_profile_mode, profile_call
+from resource_cache import ResourceCache
+from search_index import SearchIndex
+from zip_stream import ZipStream, crc32_of_file
+
+# PDF extraction runs in spawned worker processes, which re-run the main script as
+# '__mp_main__' before loading their task from pdf_processor. When the server is started
+# with `python reliefweb_server.py` that is this module, so the setup below that opens
+# stores, writes files or starts threads is skipped in those workers.
+SERVER_PROCESS = __name__ != '__mp_main__'
 
 app = Flask(__name__)
 CORS(app)
 
-# Global state
-download_status = {}
-download_files = {}
-process_status = {}
-process_files = {}
+# Default folder for fetched data, also scanned by the search index
+DATA_DIR = os.environ.get('RELIEFWEB_OUTPUT_DIR', './reliefweb_data')
+
+# Number of PDF extraction worker processes (0 = one per CPU core)
+PDF_WORKERS = int(os.environ.get('RELIEFWEB_PDF_WORKERS', '0')) or None
+# Split PDFs longer than this many pages across workers (0 = never split)
+PDF_PAGES_PER_TASK = int(os.environ.get('RELIEFWEB_PAGES_PER_TASK', '0')) or None
+
+# On-disk cache of PDF extraction results (empty RELIEFWEB_CACHE_DIR disables it)
+EXTRACTION_CACHE_DIR = os.environ.get('RELIEFWEB_CACHE_DIR', './reliefweb_cache')
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get('RELIEFWEB_CACHE_MAX_MB', '1024')) * 1024 * 1024
+
+# Default full-text output format: 'json' (single document) or 'jsonl' (streamed articles + tables + manifest)
+PROCESS_OUTPUT_FORMAT = os.environ.get('RELIEFWEB_OUTPUT_FORMAT', 'json')
+# Write JSON files without indentation, and compress full-text output ('none', 'gzip' or 'zstd')
+JSON_COMPACT = os.environ.get('RELIEFWEB_JSON_COMPACT', '0') == '1'
+try:
+    OUTPUT_COMPRESSION = serialization.check_compression(os.environ.get('RELIEFWEB_OUTPUT_COMPRESSION', 'none'))
+except ValueError as e:
+    print(f"Warning: {e}; full-text output will not be compressed")
+    OUTPUT_COMPRESSION = None
+# Also write the Parquet export of articles and tables by default (needs pyarrow)
+PARQUET_EXPORT = os.environ.get('RELIEFWEB_PARQUET_EXPORT', '0') == '1'
+
+# Similarity at which a processed PDF is labelled a near-duplicate of an earlier one (0 disables)
+DUPLICATE_THRESHOLD = float(os.environ.get('RELIEFWEB_DUPLICATE_THRESHOLD', '0.8')) or None
+
+# SQLite FTS5 full-text search index (empty RELIEFWEB_SEARCH_INDEX disables it)
+SEARCH_INDEX_PATH = os.environ.get('RELIEFWEB_SEARCH_INDEX', './reliefweb_search.db')
+search_index = SearchIndex(SEARCH_INDEX_PATH) if SEARCH_INDEX_PATH and SERVER_PROCESS else None
+
+# Profiling of background jobs: share of jobs sampled without being asked (0 = only on request),
+# sampling interval, and where profiles are kept
+PROFILE_RATE = float(os.environ.get('RELIEFWEB_PROFILE_RATE', '0'))
+PROFILE_INTERVAL = float(os.environ.get('RELIEFWEB_PROFILE_INTERVAL_MS', '10')) / 1000
+PROFILE_DIR = os.environ.get('RELIEFWEB_PROFILE_DIR', './reliefweb_profiles')
+
+# ReliefWeb API base URL (point it at benchmarks/mock_reliefweb.py for offline load tests)
+API_URL = os.environ.get('RELIEFWEB_API_URL', 'https://api.reliefweb.int/v1').rstrip('/')
+API_APPNAME = "ISI_Scraping_1234BjV0393fyHx2S2OQ"
+
+# The countries list is served from memory and refreshed in the background once older than this,
+# and kept on disk across restarts (empty RELIEFWEB_COUNTRIES_CACHE keeps it in memory only)
+COUNTRIES_TTL_SECONDS = float(os.environ.get('RELIEFWEB_COUNTRIES_TTL_HOURS', '24')) * 3600
+COUNTRIES_CACHE_PATH = os.environ.get('RELIEFWEB_COUNTRIES_CACHE', './reliefweb_countries.json')
+# How long browsers may reuse the countries list before revalidating it with its ETag
+COUNTRIES_BROWSER_MAX_AGE = 3600
+
+# Reports requested per ReliefWeb API page (the API allows up to 1000)
+API_PAGE_SIZE = int(os.environ.get('RELIEFWEB_API_PAGE_SIZE', '100'))
+
+# Concurrent PDF downloads per remote host, and per fetch job. ReliefWeb serves every PDF
+# from one host, so the job's pool defaults to the per-host limit: threads beyond it would
+# only wait for the host.
+DOWNLOAD_PER_HOST = int(os.environ.get('RELIEFWEB_DOWNLOAD_PER_HOST', '4'))
+DOWNLOAD_WORKERS = int(os.environ.get('RELIEFWEB_DOWNLOAD_WORKERS', '0')) or DOWNLOAD_PER_HOST
+# PDFs are streamed to disk in chunks of this size; larger files are rejected (0 = no limit)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+MAX_PDF_BYTES = int(os.environ.get('RELIEFWEB_MAX_PDF_MB', '0')) * 1024 * 1024
+
+# Job state, shared by every server worker through the job store
+# (RELIEFWEB_JOB_STORE is a SQLite file path, or 'memory' for a single worker)
+JOB_STORE_SPEC = os.environ.get('RELIEFWEB_JOB_STORE', './reliefweb_jobs.db')
+JOB_TTL_SECONDS = float(os.environ.get('RELIEFWEB_JOB_TTL_HOURS', '24')) * 3600
+# Unfinished jobs not updated for this long are marked as interrupted. Each worker refreshes
+# the jobs it runs or queues every JOB_HEARTBEAT_SECONDS, so only jobs lost with a worker go stale.
+JOB_STALE_SECONDS = float(os.environ.get('RELIEFWEB_JOB_STALE_MINUTES', '10')) * 60 or None
+JOB_HEARTBEAT_SECONDS = 60
+
+# Metrics are merged across server worker processes through this folder (empty RELIEFWEB_METRICS_DIR
+# reports each worker's own metrics); each worker writes its values every METRICS_SHARE_SECONDS
+METRICS_DIR = os.environ.get('RELIEFWEB_METRICS_DIR', './reliefweb_metrics')
+METRICS_SHARE_SECONDS = 5
+
+def clean_up_expired_jobs(expired):
+    """
+    Remove what the job store's expired jobs left outside it: their search index corpus
+    and profile. Profiles older than the job TTL whose job is gone (e.g. lost with a
+    memory job store) are removed too.
+    """
+    for job_id, records in expired.items():
+        if 'process_status' in records and search_index is not None:
+            removed = search_index.drop_corpus(f"upload_{job_id}")
+            if removed:
+                print(f"[{job_id}] Expired: removed {removed} documents from the search index")
+        profile = records.get('job_profiles')
+        if profile:
+            try:
+                os.remove(profile['path'])
+            except OSError:
+                pass
+
+    if os.path.isdir(PROFILE_DIR):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for entry in os.scandir(PROFILE_DIR):
+            try:
+                if (entry.name.endswith(tuple(PROFILE_EXTENSIONS.values())) and entry.is_file()
+                        and entry.stat().st_mtime < cutoff):
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+job_store = create_job_store(JOB_STORE_SPEC if SERVER_PROCESS else 'memory', ttl_seconds=JOB_TTL_SECONDS,
+                             stale_seconds=JOB_STALE_SECONDS, on_expire=clean_up_expired_jobs)
+
+download_status = job_store.table('download_status')
+download_files = job_store.table('download_files')
+process_status = job_store.table('process_status')
+process_files = job_store.table('process_files')
+job_profiles = job_store.table('job_profiles')
+
+def publish_queue_positions(status_table):
+    """Build a scheduler callback that writes each waiting job's queue position to its status"""
+    def publish(waiting_job_ids):
+        for position, job_id in enumerate(waiting_job_ids, 1):
+            status_table.patch(job_id, {
+                'status': 'queued',
+                'progress': 0,
+                'queue_position': position,
+                'message': f'Waiting in queue (position {position})...'
+            })
+    return publish
+
+def keep_jobs_alive(status_table):
+    """Build a scheduler heartbeat callback that refreshes the status records of the jobs it holds"""
+    def touch(job_ids):
+        job_store.touch(status_table.namespace, job_ids)
+    return touch
+
+# Fetch jobs are network-bound, process jobs CPU-bound (each already uses a process pool),
+# so they get separate bounded queues. Limits apply per server worker process.
+fetch_scheduler = JobScheduler(
+    'fetch',
+    concurrency=int(os.environ.get('RELIEFWEB_FETCH_CONCURRENCY', '4')),
+    max_queued=int(os.environ.get('RELIEFWEB_FETCH_QUEUE', '20')),
+    on_queue_change=publish_queue_positions(download_status),
+    on_heartbeat=keep_jobs_alive(download_status),
+    heartbeat_interval=JOB_HEARTBEAT_SECONDS
+)
+process_scheduler = JobScheduler(
+    'process',
+    concurrency=int(os.environ.get('RELIEFWEB_PROCESS_CONCURRENCY', '1')),
+    max_queued=int(os.environ.get('RELIEFWEB_PROCESS_QUEUE', '10')),
+    on_queue_change=publish_queue_positions(process_status),
+    on_heartbeat=keep_jobs_alive(process_status),
+    heartbeat_interval=JOB_HEARTBEAT_SECONDS
+)
+
+def update_queue_metrics():
+    """Set the queue gauges from this worker's schedulers"""
+    for queue, scheduler in (('fetch', fetch_scheduler), ('process', process_scheduler)):
+        stats = scheduler.stats()
+        metrics.QUEUE_JOBS.set(stats['running'], queue=queue, state='running')
+        metrics.QUEUE_JOBS.set(stats['queued'], queue=queue, state='queued')
+
+if SERVER_PROCESS:
+    metrics.REGISTRY.on_collect(update_queue_metrics)
+    if METRICS_DIR:
+        metrics.REGISTRY.share(METRICS_DIR, METRICS_SHARE_SECONDS)
+
+# Server-Sent Events: how often a stream re-reads job state, and sends a keep-alive when idle.
+# Each open stream holds a server thread (mostly asleep), so a worker keeps at most SSE_MAX_STREAMS
+# open (further clients get a 503 and poll instead) and closes each after SSE_MAX_SECONDS (EventSource
+# then reconnects after SSE_RETRY_MS). The default fits render.yaml's 16 threads per worker and
+# leaves 4 for other requests; keep it below gunicorn's --threads.
+SSE_POLL_INTERVAL = 0.5
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_STREAMS = int(os.environ.get('RELIEFWEB_SSE_MAX_STREAMS', '12'))
+SSE_MAX_SECONDS = float(os.environ.get('RELIEFWEB_SSE_MAX_SECONDS', '120'))
+SSE_RETRY_MS = 3000
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def stream_job_status(status_table, job_id):
+    """
+    Stream a job's status as Server-Sent Events: one 'data' message per change,
+    then an 'end' event once the job has finished. Streams still open after
+    SSE_MAX_SECONDS are closed without 'end', and the client reconnects.
+    """
+    if status_table.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if not sse_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many status streams open, poll the status endpoint instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(SSE_MAX_SECONDS))
+        return response
+
+    def generate():
+        last_status = None
+        started = last_sent = time.time()
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while time.time() - started < SSE_MAX_SECONDS:
+            status = status_table.get(job_id)
+            if status is None:
+                yield 'event: end\ndata: {"error": "Job not found"}\n\n'
+                return
+            if status != last_status:
+                yield f"data: {json.dumps(status)}\n\n"
+                last_status = status
+                last_sent = time.time()
+                if status.get('status') in FINISHED_STATUSES:
+                    yield 'event: end\ndata: {}\n\n'
+                    return
+            elif time.time() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ': keep-alive\n\n'
+                last_sent = time.time()
+            time.sleep(SSE_POLL_INTERVAL)
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(sse_slots.release)
+    return response
+
+def queue_full_response(scheduler):
+    """503 reply for a job rejected because the scheduler queue is full"""
+    response = jsonify({'error': f'Server busy: the {scheduler.name} queue is full, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '30'
+    return response
+
+def choose_profile_mode(requested):
+    """
+    Profile mode of a new job: the one requested, else 'sample' for a
+    RELIEFWEB_PROFILE_RATE share of the jobs that didn't say. Raises ValueError
+    for an unknown mode.
+    """
+    mode = parse_profile_mode(requested)
+    if mode is None and requested in (None, '') and PROFILE_RATE and random.random() < PROFILE_RATE:
+        mode = 'sample'
+    return mode
+
+def run_profiled_job(job_id, mode, status_table, func, *args):
+    """
+    Run a background job function under the profiler, then record the profile for
+    /api/download/profile/<job_id> and add its summary to the job status.
+    Helper threads named '<job_id>-...' are sampled along with the job thread, and
+    PDF extraction tasks are profiled in their worker processes and merged in.
+    """
+    path = os.path.join(PROFILE_DIR, f"{job_id}{PROFILE_EXTENSIONS[mode]}")
+    summary = profile_call(mode, path, func, *args, thread_prefixes=(f"{job_id}-",), interval=PROFILE_INTERVAL)
+    job_profiles[job_id] = {'mode': mode, 'path': path}
+    status_table.patch(job_id, {'profile': {k: v for k, v in summary.items() if k != 'path'}})
+    print(f"[{job_id}] Profile ({mode}) written to {path}")
+
+def submit_job(scheduler, job_id, profile_mode, status_table, func, *args):
+    """Queue a background job, wrapped in the profiler if profile_mode is set"""
+    if profile_mode is None:
+        return scheduler.submit(job_id, func, *args)
+    return scheduler.submit(job_id, run_profiled_job, job_id, profile_mode, status_table, func, *args)
 
 # ============================================================
 # SECTION 1: Document Fetcher (existing functionality)
@@ -36,8 +309,147 @@ def extract_text_content(fields):
         return fields['body']
     return ''
 
-def fetch_reports_background(job_id, disaster_name, country_code, country_name, output_dir):
-    """Background task to fetch reports and download PDFs"""
+def create_http_session(pool_size):
+    """Create a keep-alive session whose connection pool fits pool_size concurrent requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class HostLimiter:
+    """Caps the number of concurrent requests made to any single host"""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    @contextmanager
+    def limit(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with semaphore:
+            yield
+
+def download_pdf(session, host_limiter, file_url, pdf_path, stage_timer=None):
+    """
+    Stream one PDF to pdf_path and return (size in bytes, CRC-32).
+    The body is written in chunks to a temporary file that is renamed into
+    place once complete, so a failed download never leaves a partial PDF.
+    The CRC is recorded so the ZIP download can store the file without re-reading it.
+    Successful downloads are timed as the 'download' stage of stage_timer, from
+    the moment the host limiter lets them start.
+    """
+    tmp_path = f"{pdf_path}.{uuid.uuid4().hex[:8]}.part"
+    size = 0
+    crc = 0
+    # The temporary file only exists while the download runs, not while it waits for its host
+    with host_limiter.limit(file_url):
+        started = time.perf_counter()
+        try:
+            with open(tmp_path, 'wb') as f, session.get(file_url, timeout=120, stream=True) as pdf_response:
+                pdf_response.raise_for_status()
+
+                content_length = int(pdf_response.headers.get('Content-Length') or 0)
+                if MAX_PDF_BYTES and content_length > MAX_PDF_BYTES:
+                    raise ValueError(f'PDF is {content_length} bytes, over the {MAX_PDF_BYTES} byte limit')
+
+                for chunk in pdf_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if MAX_PDF_BYTES and size > MAX_PDF_BYTES:
+                        raise ValueError(f'PDF exceeds the {MAX_PDF_BYTES} byte limit')
+                    f.write(chunk)
+                    crc = zlib.crc32(chunk, crc)
+            os.replace(tmp_path, pdf_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    if stage_timer is not None:
+        stage_timer.add('download', time.perf_counter() - started, size)
+    return size, crc
+
+def find_previous_pdfs(output_dir, disaster_name, country_code):
+    """
+    Index the PDFs saved by earlier runs of the same disaster/country query.
+    Returns {(reliefweb_id, file_url): {'changed': ..., 'path': ..., 'crc32': ...}}, newest run first.
+    """
+    prefix = f"{disaster_name.replace(' ', '_')}_{country_code}"
+    json_filename = f"{prefix}_reports.json"
+    if not os.path.isdir(output_dir):
+        return {}
+
+    previous = {}
+    run_dirs = sorted((d for d in os.listdir(output_dir) if d.startswith(prefix + '_')), reverse=True)
+    for run_dir in run_dirs:
+        json_path = os.path.join(output_dir, run_dir, json_filename)
+        if not os.path.exists(json_path):
+            continue
+        try:
+            with open(json_path, 'rb') as f:
+                run_data = serialization.loads(f.read())
+        except Exception as e:
+            print(f"Warning: could not read earlier run {json_path}: {e}")
+            continue
+
+        for report in run_data.get('reports', []):
+            changed = (report.get('date') or {}).get('changed', '')
+            for file_info in report.get('files', []):
+                saved_filename = file_info.get('saved_filename', '') or file_info.get('filename', '')
+                pdf_path = os.path.join(output_dir, run_dir, 'pdfs', saved_filename)
+                key = (str(report.get('reliefweb_id', '')), file_info.get('url', ''))
+                if saved_filename and key[1] and key not in previous and os.path.exists(pdf_path):
+                    previous[key] = {'changed': changed, 'path': pdf_path, 'crc32': file_info.get('crc32')}
+
+    return previous
+
+def reuse_pdf(source_path, pdf_path, crc=None):
+    """
+    Hard-link a PDF from an earlier run into this one (copying across filesystems).
+    Returns (size in bytes, CRC-32), reading the file only if the earlier run did not record its CRC.
+    """
+    try:
+        os.link(source_path, pdf_path)
+    except OSError:
+        shutil.copy2(source_path, pdf_path)
+    return os.path.getsize(pdf_path), crc if crc is not None else crc32_of_file(pdf_path)
+
+def iter_report_pages(session, url, params, payload, page_size=None, stage_timer=None):
+    """
+    Yield (reports, total_count) from the ReliefWeb API one offset/limit page at a time.
+    Each page request is timed as the 'api_fetch' stage of stage_timer.
+    """
+    page_size = page_size or API_PAGE_SIZE
+    offset = 0
+    while True:
+        started = time.perf_counter()
+        response = session.post(url, params=params, json=dict(payload, offset=offset, limit=page_size), timeout=60)
+        response.raise_for_status()
+        data = response.json()
+        if stage_timer is not None:
+            stage_timer.add('api_fetch', time.perf_counter() - started, len(response.content))
+
+        reports = data.get('data', [])
+        total_count = data.get('totalCount', offset + len(reports))
+        if reports:
+            yield reports, total_count
+
+        offset += len(reports)
+        if not reports or offset >= total_count:
+            break
+
+def fetch_reports_background(job_id, disaster_name, country_code, country_name, output_dir,
+                             incremental=False):
+    """
+    Background task to fetch reports and download PDFs.
+    With incremental=True, PDFs of reports unchanged since an earlier run of the
+    same query (same date.changed and file URL) are reused instead of downloaded.
+    """
+    session = create_http_session(DOWNLOAD_WORKERS)
+    stage_timer = StageTimer('fetch')
     try:
         download_status[job_id] = {
             'status': 'fetching',
@@ -47,11 +459,10 @@ def fetch_reports_background(job_id, disaster_name, country_code, country_name,
             'downloaded_pdfs': 0
         }
 
-        url = "https://api.reliefweb.int/v1/reports"
-        params = {"appname": "ISI_Scraping_1234BjV0393fyHx2S2OQ"}
+        url = f"{API_URL}/reports"
+        params = {"appname": API_APPNAME}
 
         payload = {
-            "limit": 1000,
             "preset": "latest",
             "profile": "full",
             "filter": {
@@ -74,89 +485,172 @@ def fetch_reports_background(job_id, disaster_name, country_code, country_name,
 
         print(f"[{job_id}] Fetching reports for {disaster_name} in {country_name}...")
 
-        response = requests.post(url, params=params, json=payload, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-
-        reports = data.get('data', [])
-        total = len(reports)
-
-        print(f"[{job_id}] Found {total} reports")
-
-        download_status[job_id].update({
-            'status': 'downloading',
-            'total_reports': total,
-            'message': f'Found {total} reports. Downloading PDFs...'
-        })
-
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         job_output_dir = os.path.join(output_dir, f"{disaster_name.replace(' ', '_')}_{country_code}_{timestamp}")
+        # Another job for the same query may have started in the same second
+        run_number = 1
+        while True:
+            try:
+                os.makedirs(job_output_dir)
+                break
+            except FileExistsError:
+                run_number += 1
+                job_output_dir = os.path.join(
+                    output_dir, f"{disaster_name.replace(' ', '_')}_{country_code}_{timestamp}_{run_number}")
         pdf_dir = os.path.join(job_output_dir, "pdfs")
         os.makedirs(pdf_dir, exist_ok=True)
 
-        results = []
-        total_pdfs = 0
-
-        for i, report in enumerate(reports, 1):
-            fields = report.get('fields', {})
-            report_id = report.get('id', '')
-
-            print(f"[{job_id}] Processing {i}/{total}: {fields.get('title', 'Untitled')[:60]}...")
-
-            report_data = {
-                'reliefweb_id': report_id,
-                'title': fields.get('title', ''),
-                'date': fields.get('date', {}),
-                'url': fields.get('url_alias', ''),
-                'body_text': extract_text_content(fields),
-                'source': [s.get('name', '') for s in fields.get('source', [])],
-                'files': []
-            }
-
-            files = fields.get('file', [])
-            for file_info in files:
-                file_url = file_info.get('url', '')
-                filename = file_info.get('filename', 'document.pdf')
-
-                if 'pdf' in filename.lower() and file_url:
-                    try:
-                        print(f"[{job_id}]   Downloading: {filename}")
-
-                        pdf_response = requests.get(file_url, timeout=120)
-                        pdf_response.raise_for_status()
-
-                        safe_filename = f"{report_id}_{filename}"
-                        safe_filename = "".join(c for c in safe_filename if c.isalnum() or c in ('_', '-', '.'))
-                        pdf_path = os.path.join(pdf_dir, safe_filename)
-
-                        with open(pdf_path, 'wb') as f:
-                            f.write(pdf_response.content)
-
-                        print(f"[{job_id}]   Saved: {safe_filename} ({len(pdf_response.content)} bytes)")
-
-                        report_data['files'].append({
-                            'saved_filename': safe_filename,
-                            'filename': filename,
-                            'path': pdf_path,
-                            'url': file_url,
-                            'size': len(pdf_response.content)
-                        })
-
-                        total_pdfs += 1
-
-                    except Exception as e:
-                        print(f"[{job_id}]   Error downloading {filename}: {e}")
-
-            results.append(report_data)
+        previous_pdfs = find_previous_pdfs(output_dir, disaster_name, country_code) if incremental else {}
 
-            progress = int((i / total) * 90)
-            download_status[job_id].update({
+        results = []
+        downloads = []
+        seen_ids = set()
+        downloaded = {}
+        # Files still outstanding per report; a report is done once all its files are in
+        pending_files = []
+        counters = {'total': 0, 'reports_done': 0, 'total_pdfs': 0, 'reused_pdfs': 0}
+        lock = threading.Lock()
+
+        def update_progress():
+            total = counters['total']
+            progress = int((counters['reports_done'] / max(total, 1)) * 90)
+            status = {
                 'progress': progress,
-                'downloaded_pdfs': total_pdfs,
-                'message': f'Processed {i}/{total} reports, downloaded {total_pdfs} PDFs...'
-            })
-
-        download_status[job_id].update({
+                'downloaded_pdfs': counters['total_pdfs'],
+                'message': f"Processed {counters['reports_done']}/{total} reports, "
+                           f"downloaded {counters['total_pdfs']} PDFs..."
+            }
+            if incremental:
+                status['reused_pdfs'] = counters['reused_pdfs']
+            download_status.patch(job_id, status)
+
+        def file_done(j, file_entry, reused=False):
+            i = downloads[j][0]
+            with lock:
+                if file_entry:
+                    downloaded[j] = file_entry
+                    counters['total_pdfs'] += 1
+                    counters['reused_pdfs'] += reused
+                pending_files[i] -= 1
+                if pending_files[i] == 0:
+                    counters['reports_done'] += 1
+                update_progress()
+
+        def download_done(j, future):
+            i, filename, safe_filename, file_url = downloads[j]
+            try:
+                size, crc = future.result()
+                metrics.PDF_DOWNLOADS.inc(result='downloaded')
+                print(f"[{job_id}]   Saved: {safe_filename} ({size} bytes)")
+                file_done(j, {
+                    'saved_filename': safe_filename,
+                    'filename': filename,
+                    'path': os.path.join(pdf_dir, safe_filename),
+                    'url': file_url,
+                    'size': size,
+                    'crc32': crc
+                })
+            except Exception as e:
+                metrics.PDF_DOWNLOADS.inc(result='failed')
+                print(f"[{job_id}]   Error downloading {filename}: {e}")
+                file_done(j, None)
+
+        def try_reuse(j):
+            i, filename, safe_filename, file_url = downloads[j]
+            previous = previous_pdfs.get((str(results[i]['reliefweb_id']), file_url))
+            if not previous or previous['changed'] != results[i]['date'].get('changed', ''):
+                return False
+            pdf_path = os.path.join(pdf_dir, safe_filename)
+            started = time.perf_counter()
+            try:
+                size, crc = reuse_pdf(previous['path'], pdf_path, previous['crc32'])
+            except OSError as e:
+                print(f"[{job_id}]   Could not reuse {previous['path']}: {e}")
+                return False
+            stage_timer.add('reuse', time.perf_counter() - started, size)
+            metrics.PDF_DOWNLOADS.inc(result='reused')
+            print(f"[{job_id}]   Reused: {safe_filename} ({size} bytes)")
+            file_done(j, {
+                'saved_filename': safe_filename,
+                'filename': filename,
+                'path': pdf_path,
+                'url': file_url,
+                'size': size,
+                'crc32': crc
+            }, reused=True)
+            return True
+
+        # Downloads for one page run in the pool while the next page is being fetched
+        host_limiter = HostLimiter(DOWNLOAD_PER_HOST)
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix=f"{job_id}-download") as executor:
+            for page_reports, total_count in iter_report_pages(session, url, params, payload,
+                                                               stage_timer=stage_timer):
+                with lock:
+                    if not counters['total']:
+                        print(f"[{job_id}] Found {total_count} reports")
+                    counters['total'] = total_count
+                    download_status.patch(job_id, {'status': 'downloading', 'total_reports': total_count})
+
+                for report in page_reports:
+                    fields = report.get('fields', {})
+                    report_id = report.get('id', '')
+
+                    # Reports can shift between pages if the feed changes mid-fetch
+                    if report_id in seen_ids:
+                        continue
+                    seen_ids.add(report_id)
+
+                    i = len(results)
+                    results.append({
+                        'reliefweb_id': report_id,
+                        'title': fields.get('title', ''),
+                        'date': fields.get('date', {}),
+                        'url': fields.get('url_alias', ''),
+                        'body_text': extract_text_content(fields),
+                        'source': [s.get('name', '') for s in fields.get('source', [])],
+                        'files': []
+                    })
+
+                    report_downloads = []
+                    for file_info in fields.get('file', []):
+                        file_url = file_info.get('url', '')
+                        filename = file_info.get('filename', 'document.pdf')
+
+                        if 'pdf' in filename.lower() and file_url:
+                            safe_filename = f"{report_id}_{filename}"
+                            safe_filename = "".join(c for c in safe_filename if c.isalnum() or c in ('_', '-', '.'))
+                            report_downloads.append((i, filename, safe_filename, file_url))
+
+                    with lock:
+                        pending_files.append(len(report_downloads))
+                        if not report_downloads:
+                            counters['reports_done'] += 1
+
+                    for download in report_downloads:
+                        j = len(downloads)
+                        downloads.append(download)
+                        if try_reuse(j):
+                            continue
+                        print(f"[{job_id}]   Downloading: {download[1]}")
+                        pdf_path = os.path.join(pdf_dir, download[2])
+                        future = executor.submit(download_pdf, session, host_limiter, download[3], pdf_path,
+                                                 stage_timer)
+                        future.add_done_callback(lambda f, j=j: download_done(j, f))
+
+                with lock:
+                    update_progress()
+
+        total_pdfs = counters['total_pdfs']
+        reused_pdfs = counters['reused_pdfs']
+        if incremental:
+            print(f"[{job_id}] Reused {reused_pdfs} PDFs from earlier runs")
+
+        # Attach files to their reports in the original order
+        for j, (i, _, _, _) in enumerate(downloads):
+            if j in downloaded:
+                results[i]['files'].append(downloaded[j])
+
+        download_status.patch(job_id, {
             'progress': 90,
             'message': 'Creating JSON metadata file...'
         })
@@ -174,34 +668,22 @@ def fetch_reports_background(job_id, disaster_name, country_code, country_name,
             'reports': results
         }
 
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
+        with stage_timer.time('serialization'):
+            serialization.dump(json_data, json_path, JSON_COMPACT)
 
         print(f"[{job_id}] JSON saved: {json_path}")
 
-        download_status[job_id].update({
-            'progress': 95,
-            'message': 'Creating ZIP file...'
-        })
-
+        # The ZIP is built on request from these files (see download_zip)
         zip_filename = f"{disaster_name.replace(' ', '_')}_{country_code}_pdfs.zip"
-        zip_path = os.path.join(job_output_dir, zip_filename)
-
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for result in results:
-                for file_info in result['files']:
-                    if os.path.exists(file_info['path']):
-                        zipf.write(file_info['path'], os.path.basename(file_info['path']))
-            zipf.write(json_path, json_filename)
-
-        print(f"[{job_id}] ZIP created: {zip_path}")
-
         download_files[job_id] = {
             'json_path': json_path,
-            'zip_path': zip_path,
             'output_dir': job_output_dir,
             'json_filename': json_filename,
-            'zip_filename': zip_filename
+            'zip_filename': zip_filename,
+            'pdfs': [
+                [os.path.basename(file_info['path']), file_info['path'], file_info['size'], file_info['crc32']]
+                for result in results for file_info in result['files']
+            ]
         }
 
         download_status[job_id] = {
@@ -210,11 +692,23 @@ def fetch_reports_background(job_id, disaster_name, country_code, country_name,
             'message': 'Download complete!',
             'total_reports': len(results),
             'downloaded_pdfs': total_pdfs,
-            'output_dir': job_output_dir
+            'reused_pdfs': reused_pdfs,
+            'output_dir': job_output_dir,
+            'stage_timings': stage_timer.summary()
         }
 
         print(f"[{job_id}] COMPLETED - {total_pdfs} PDFs from {len(results)} reports")
 
+        # Make the reports searchable until their PDFs are processed
+        if search_index is not None:
+            try:
+                with stage_timer.time('search_index'):
+                    search_index.index_folder(job_output_dir)
+                download_status.patch(job_id, {'stage_timings': stage_timer.summary()})
+            except Exception as e:
+                print(f"[{job_id}] Warning: could not index reports for search: {e}")
+        stage_timer.finish('completed')
+
     except Exception as e:
         print(f"[{job_id}] ERROR: {e}")
         import traceback
@@ -224,185 +718,154 @@ def fetch_reports_background(job_id, disaster_name, country_code, country_name,
             'progress': 0,
             'message': f'Error: {str(e)}'
         }
+        stage_timer.finish('error')
+    finally:
+        session.close()
 
 
 # ============================================================
 # SECTION 2: PDF Text Processor (upload & process)
 # ============================================================
 
-def process_uploaded_pdfs_background(job_id, upload_dir, pdf_files_info, json_data):
+def process_uploaded_pdfs_background(job_id, upload_dir, pdf_files_info, json_data, output_format='json',
+                                     parquet=False):
     """Background task to process uploaded PDFs using pdf_processor logic."""
+    stage_timer = StageTimer('process')
     try:
-        from pdf_processor import extract_text_from_pdf, match_pdf_to_report
+        from pdf_processor import (iter_extracted_pdfs, ReportIndex, report_key, articles_without_pdfs,
+                                   pdf_article, output_header, create_output_writer)
+        from near_duplicates import NearDuplicateDetector
+        from extraction_cache import ExtractionCache
         from pathlib import Path
 
+        cache = ExtractionCache(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES) if EXTRACTION_CACHE_DIR else None
+
         total_pdfs = len(pdf_files_info)
         reports = json_data.get('reports', []) if json_data else []
+        report_index = ReportIndex(reports)
+        matched_keys = set()
 
         process_status[job_id] = {
             'status': 'processing',
             'progress': 5,
             'message': f'Starting text extraction from {total_pdfs} PDFs...',
             'total_pdfs': total_pdfs,
-            'processed': 0
+            'processed': 0,
+            'cache_hits': 0,
+            'cache_misses': 0
         }
 
-        # Build output structure (same as pdf_processor.process_pdfs)
-        emdat_event = json_data.get('emdat_event', {}) if json_data else {}
-
-        output = {
-            "DisNo": emdat_event.get('DisNo', ''),
-            "disaster_type": emdat_event.get('disaster_type', json_data.get('disaster', '') if json_data else ''),
-            "country": emdat_event.get('country', json_data.get('country', '') if json_data else ''),
-            "iso2": emdat_event.get('iso2', json_data.get('country_code', '') if json_data else ''),
-            "location": emdat_event.get('location', ''),
-            "start_dt": emdat_event.get('start_dt', ''),
-            "query": emdat_event.get('query', json_data.get('disaster', '') if json_data else ''),
-            "articles": []
-        }
+        # Same output structure as pdf_processor.process_pdfs, written as articles finish
+        output_filename = f"reports_full_text_{job_id[:20]}.json"
+        output_path = os.path.join(upload_dir, output_filename)
+        header = output_header(json_data or {})
+        # Reports already indexed from their data folder are updated there; the upload corpus
+        # only holds the rest and is dropped when the job expires
+        exports = ([search_index.corpus_indexer(f"upload_{job_id}", header, attach=True)]
+                   if search_index is not None else [])
+        writer = create_output_writer(output_format, Path(output_path), header,
+                                      JSON_COMPACT, OUTPUT_COMPRESSION, parquet, exports)
 
-        pdf_tables_collection = []
         matching_stats = {
             "exact_match": 0, "partial_match": 0, "id_match": 0,
             "reliefweb_id_match": 0, "title_match": 0, "no_match": 0
         }
 
-        for idx, pdf_info in enumerate(pdf_files_info):
-            pdf_path = Path(pdf_info['path'])
-            pdf_filename = pdf_info['original_name']
-            percent = 10 + int((idx / max(total_pdfs, 1)) * 70)
+        detector = NearDuplicateDetector(DUPLICATE_THRESHOLD) if DUPLICATE_THRESHOLD else None
 
-            process_status[job_id].update({
+        def report_extracted(done, total, pdf_path):
+            percent = 10 + int((done / max(total, 1)) * 70)
+            status = {
                 'progress': percent,
-                'message': f'Processing PDF {idx + 1}/{total_pdfs}: {pdf_filename[:50]}...',
-                'processed': idx + 1
-            })
-
-            pdf_text, pdf_tables = extract_text_from_pdf(pdf_path)
-
-            if pdf_tables:
-                pdf_tables_collection.append({
-                    "pdf_filename": pdf_filename,
-                    "tables": pdf_tables
-                })
-
-            matched_report = match_pdf_to_report(pdf_filename, reports)
-
-            article = {
-                "pdf_filename": pdf_filename,
-                "has_pdf": True,
-                "pdf_text": pdf_text,
-                "pdf_text_length": len(pdf_text)
+                'message': f'Extracted PDF {done}/{total}: {pdf_path.name[:50]}...',
+                'processed': done
             }
-
-            if matched_report:
-                files = matched_report.get('files', [])
-                exact = False
-                for fi in files:
-                    sf = fi.get('saved_filename', '') or fi.get('filename', '')
-                    if sf.lower() == pdf_filename.lower():
-                        exact = True
-                        matching_stats["exact_match"] += 1
-                        break
-                if not exact:
-                    pdf_parts = pdf_filename.replace('.pdf', '').split('_')
-                    if len(pdf_parts) >= 1 and pdf_parts[0] == str(matched_report.get('reliefweb_id', '')):
-                        matching_stats["reliefweb_id_match"] += 1
-                    else:
-                        matching_stats["title_match"] += 1
-
-                sources = matched_report.get('sources', matched_report.get('source', []))
-                if isinstance(sources, list) and sources and isinstance(sources[0], dict):
-                    source_names = [s.get('name', '') for s in sources]
-                else:
-                    source_names = sources if isinstance(sources, list) else []
-
-                language = matched_report.get('language', {})
-                language_name = language.get('name', '') if isinstance(language, dict) else str(language)
-                date_info = matched_report.get('date', {})
-
-                article.update({
-                    "title": matched_report.get('title', ''),
-                    "date": {
-                        "created": date_info.get('created', ''),
-                        "changed": date_info.get('changed', ''),
-                        "original": date_info.get('original', '')
-                    },
-                    "url": matched_report.get('url', ''),
-                    "sources": source_names,
-                    "language": language_name,
-                    "body_text": matched_report.get('body_text', matched_report.get('content', {}).get('body_text', ''))
-                })
-            else:
-                matching_stats["no_match"] += 1
-                article.update({
-                    "title": "", "date": {"created": "", "changed": "", "original": ""},
-                    "url": "", "sources": [], "language": "", "body_text": ""
-                })
-
-            output['articles'].append(article)
-
-        # Add reports without PDFs
-        process_status[job_id].update({'progress': 85, 'message': 'Adding reports without PDFs...'})
-        for report in reports:
-            report_title = report.get('title', '')
-            already_processed = any(a.get('title') == report_title for a in output['articles'])
-            if not already_processed:
-                sources = report.get('sources', report.get('source', []))
-                if isinstance(sources, list) and sources and isinstance(sources[0], dict):
-                    source_names = [s.get('name', '') for s in sources]
-                else:
-                    source_names = sources if isinstance(sources, list) else []
-                language = report.get('language', {})
-                language_name = language.get('name', '') if isinstance(language, dict) else str(language)
-                date_info = report.get('date', {})
-                article = {
-                    "pdf_filename": "", "has_pdf": False, "pdf_text": "", "pdf_text_length": 0,
-                    "title": report.get('title', ''),
-                    "date": {"created": date_info.get('created', ''), "changed": date_info.get('changed', ''), "original": date_info.get('original', '')},
-                    "url": report.get('url', report.get('url_alias', '')),
-                    "sources": source_names, "language": language_name,
-                    "body_text": report.get('body_text', report.get('content', {}).get('body_text', ''))
-                }
-                output['articles'].append(article)
-
-        output['n_documents'] = len(output['articles'])
-        output['pdf_tables'] = pdf_tables_collection
-        output['processing_metadata'] = {
-            "processing_date": datetime.now().isoformat(),
-            "total_pdfs_found": total_pdfs,
-            "total_reports": len(reports),
-            "matching_statistics": matching_stats
-        }
-
-        # Save output JSON
-        process_status[job_id].update({'progress': 92, 'message': 'Saving full-text JSON...'})
-        output_filename = f"reports_full_text_{job_id[:20]}.json"
-        output_path = os.path.join(upload_dir, output_filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output, f, ensure_ascii=False, indent=2)
-
-        articles_with_pdf = sum(1 for a in output['articles'] if a.get('has_pdf'))
-        articles_without_pdf = sum(1 for a in output['articles'] if not a.get('has_pdf'))
-
+            if cache is not None:
+                status.update(cache.stats())
+            process_status.patch(job_id, status)
+
+        try:
+            pdf_paths = [Path(pdf_info['path']) for pdf_info in pdf_files_info]
+            for idx, pdf_path, pdf_text, pdf_tables, signature in iter_extracted_pdfs(
+                    pdf_paths, PDF_WORKERS, report_extracted, PDF_PAGES_PER_TASK, cache, stage_timer,
+                    signatures=detector is not None):
+                pdf_filename = pdf_files_info[idx]['original_name']
+
+                if pdf_tables:
+                    with stage_timer.time('write'):
+                        writer.write_tables(pdf_filename, pdf_tables)
+
+                with stage_timer.time('matching'):
+                    matched_report, match_type = report_index.match(pdf_filename)
+                matching_stats[match_type] += 1
+                if matched_report:
+                    matched_keys.add(report_key(matched_report))
+
+                article = pdf_article(pdf_filename, pdf_text, match_type, matched_report)
+                if detector is not None:
+                    with stage_timer.time('near_duplicates'):
+                        detector.label(article, signature)
+                with stage_timer.time('write'):
+                    writer.write_article(article)
+
+            # Add reports without PDFs
+            process_status.patch(job_id, {'progress': 85, 'message': 'Adding reports without PDFs...'})
+            for article in articles_without_pdfs(reports, matched_keys):
+                if detector is not None:
+                    detector.label(article)
+                with stage_timer.time('write'):
+                    writer.write_article(article)
+
+            processing_metadata = {
+                "processing_date": datetime.now().isoformat(),
+                "total_pdfs_found": total_pdfs,
+                "total_reports": len(reports),
+                "matching_statistics": matching_stats
+            }
+            if cache is not None:
+                processing_metadata['cache_statistics'] = cache.stats()
+            if detector is not None:
+                processing_metadata['near_duplicate_statistics'] = detector.stats()
+            processing_metadata['stage_timings'] = stage_timer.summary()
+
+            # Save output
+            process_status.patch(job_id, {'progress': 92, 'message': 'Saving full-text output...'})
+            with stage_timer.time('serialization'):
+                output_files = writer.close(processing_metadata)
+        except BaseException:
+            writer.abort()
+            raise
+
+        # Downloadable files by artifact name; the first one is served by default
         process_files[job_id] = {
-            'output_path': output_path,
-            'output_filename': output_filename
+            'output_format': output_format,
+            'artifacts': {
+                name: {'path': path, 'filename': os.path.basename(path)}
+                for name, path in output_files.items()
+            }
         }
 
-        process_status[job_id] = {
+        status = {
             'status': 'completed',
             'progress': 100,
             'message': 'Processing complete!',
             'total_pdfs': total_pdfs,
             'processed': total_pdfs,
-            'articles_with_pdf': articles_with_pdf,
-            'articles_without_pdf': articles_without_pdf,
-            'total_articles': output['n_documents'],
-            'matching_statistics': matching_stats
+            'articles_with_pdf': writer.articles_with_pdf,
+            'articles_without_pdf': writer.n_documents - writer.articles_with_pdf,
+            'total_articles': writer.n_documents,
+            'matching_statistics': matching_stats,
+            'near_duplicate_statistics': detector.stats() if detector is not None else None,
+            'output_format': output_format,
+            'artifacts': list(output_files),
+            'stage_timings': stage_timer.summary()
         }
+        if cache is not None:
+            status.update(cache.stats())
+        process_status[job_id] = status
+        stage_timer.finish('completed')
 
-        print(f"[PROCESS {job_id}] COMPLETED - {total_pdfs} PDFs processed, {output['n_documents']} articles total")
+        print(f"[PROCESS {job_id}] COMPLETED - {total_pdfs} PDFs processed, {writer.n_documents} articles total")
 
     except Exception as e:
         print(f"[PROCESS {job_id}] ERROR: {e}")
@@ -413,6 +876,104 @@ def process_uploaded_pdfs_background(job_id, upload_dir, pdf_files_info, json_da
             'progress': 0,
             'message': f'Error: {str(e)}'
         }
+        stage_timer.finish('error')
+
+
+def send_output_file(path, filename):
+    """
+    Send a result file as an attachment. Files stored gzip/zstd-compressed are sent
+    as-is with Content-Encoding when the client accepts it, and decompressed on the
+    fly otherwise; either way the download is named without the compression suffix.
+    """
+    encoding = serialization.content_encoding(path)
+    if encoding is None:
+        return send_file(path, as_attachment=True, download_name=filename)
+
+    download_name = os.path.splitext(filename)[0]
+    mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    if encoding in request.accept_encodings:
+        response = send_file(path, as_attachment=True, download_name=download_name, mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        # The decompressed length isn't known up front, so this representation gets
+        # its own validators and supports conditional requests but not ranges
+        stat = os.stat(path)
+        response = Response(mimetype=mimetype)
+        response.set_etag(f"{stat.st_mtime}-{stat.st_size}-identity")
+        response.last_modified = int(stat.st_mtime)
+        response.cache_control.no_cache = True
+        response.accept_ranges = 'none'
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        response.make_conditional(request)
+        if response.status_code == 200:
+            def generate():
+                with serialization.open_decoded(path) as f:
+                    for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                        yield chunk
+
+            response.response = generate()
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def send_zip_stream(archive, filename):
+    """
+    Stream a ZipStream as an attachment, honouring conditional requests
+    (If-None-Match / If-Modified-Since -> 304) and single byte ranges
+    (Range, guarded by If-Range -> 206 or 416), so interrupted downloads can resume.
+    Only the requested bytes are read from disk.
+    """
+    etag = archive.etag
+    last_modified = datetime.fromtimestamp(int(archive.last_modified), timezone.utc)
+    size = archive.size
+
+    response = Response(mimetype='application/zip')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.accept_ranges = 'bytes'
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response.status_code = 304
+        return response
+
+    # A Range is only honoured if If-Range (when sent) still matches the archive;
+    # multi-range requests get the whole archive
+    if_range = request.if_range
+    range_valid = (if_range.etag is None and if_range.date is None) or if_range.etag == etag \
+        or (if_range.date is not None and last_modified <= if_range.date)
+    start, end = 0, size
+    byte_range = request.range
+    if byte_range is not None and byte_range.units == 'bytes' and len(byte_range.ranges) == 1 and range_valid:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            response.status_code = 416
+            response.content_range = ContentRange('bytes', None, None, size)
+            return response
+        start, end = bounds
+        response.status_code = 206
+        response.content_range = ContentRange('bytes', start, end, size)
+
+    response.response = stream_with_context(timed_stream(archive.iter_range(start, end), 'zip'))
+    response.content_length = end - start
+    return response
+
+
+def timed_stream(chunks, stage):
+    """
+    Pass a streamed response body through, recording how long it took to send
+    and how many bytes went out as a 'download' job stage (also for aborted transfers).
+    """
+    started = time.perf_counter()
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, job='download', stage=stage)
+        metrics.STAGE_BYTES.inc(sent, job='download', stage=stage)
 
 
 # ============================================================
@@ -428,55 +989,105 @@ def fetch_reports():
     disaster_name = data.get('disaster_name')
     country_code = data.get('country_code')
     country_name = data.get('country_name')
-    output_dir = data.get('output_dir', './reliefweb_data')
+    output_dir = data.get('output_dir', DATA_DIR)
+    incremental = bool(data.get('incremental', False))
 
     if not all([disaster_name, country_code, country_name]):
         return jsonify({'error': 'Missing required parameters'}), 400
 
-    job_id = f"{disaster_name.replace(' ', '_')}_{country_code}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        profile_mode = choose_profile_mode(data.get('profile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The random suffix keeps ids of identical queries submitted in the same second apart
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    job_id = f"{disaster_name.replace(' ', '_')}_{country_code}_{timestamp}_{uuid.uuid4().hex[:6]}"
 
     print(f"\n{'='*70}")
     print(f"NEW FETCH JOB: {job_id}")
     print(f"{'='*70}\n")
 
-    thread = threading.Thread(
-        target=fetch_reports_background,
-        args=(job_id, disaster_name, country_code, country_name, output_dir),
-        daemon=True
-    )
-    thread.start()
+    try:
+        position = submit_job(
+            fetch_scheduler, job_id, profile_mode, download_status, fetch_reports_background,
+            job_id, disaster_name, country_code, country_name, output_dir, incremental
+        )
+    except QueueFullError:
+        return queue_full_response(fetch_scheduler)
 
-    return jsonify({'job_id': job_id})
+    return jsonify({'job_id': job_id, 'queue_position': position, 'profile': profile_mode})
 
 @app.route('/api/status/<job_id>', methods=['GET'])
 def get_status(job_id):
     """Get status of a fetch job"""
-    if job_id not in download_status:
+    status = download_status.get(job_id)
+    if status is None:
         return jsonify({'error': 'Job not found'}), 404
-    return jsonify(download_status[job_id])
+    return jsonify(status)
+
+@app.route('/api/status/<job_id>/stream', methods=['GET'])
+def stream_status(job_id):
+    """Stream status updates of a fetch job (Server-Sent Events)"""
+    return stream_job_status(download_status, job_id)
+
+def build_job_zip(files):
+    """
+    Lay out the ZIP of a fetch job: its PDFs stored as-is, plus the deflated metadata JSON.
+    """
+    archive = ZipStream()
+    for arcname, path, size, crc in files.get('pdfs', []):
+        archive.add_file(arcname, path, size, crc)
+    json_path = files.get('json_path')
+    if json_path and os.path.exists(json_path):
+        with open(json_path, 'rb') as f:
+            archive.add_bytes(files['json_filename'], f.read(), os.path.getmtime(json_path))
+    return archive
 
 @app.route('/api/download/zip/<job_id>', methods=['GET'])
 def download_zip(job_id):
-    """Download the ZIP file"""
-    if job_id not in download_files:
+    """Download the PDFs and metadata JSON as a ZIP, streamed as it is built (resumable)"""
+    files = download_files.get(job_id)
+    if files is None:
         return jsonify({'error': 'Job files not found'}), 404
-    files = download_files[job_id]
-    zip_path = files.get('zip_path')
-    if not zip_path or not os.path.exists(zip_path):
+    if 'pdfs' not in files:
         return jsonify({'error': 'ZIP file not found'}), 404
-    return send_file(zip_path, as_attachment=True, download_name=files.get('zip_filename', 'documents.zip'))
+    return send_zip_stream(build_job_zip(files), files.get('zip_filename', 'documents.zip'))
 
 @app.route('/api/download/json/<job_id>', methods=['GET'])
 def download_json(job_id):
     """Download the JSON metadata file"""
-    if job_id not in download_files:
+    files = download_files.get(job_id)
+    if files is None:
         return jsonify({'error': 'Job files not found'}), 404
-    files = download_files[job_id]
     json_path = files.get('json_path')
     if not json_path or not os.path.exists(json_path):
         return jsonify({'error': 'JSON file not found'}), 404
     return send_file(json_path, as_attachment=True, download_name=files.get('json_filename', 'reports.json'))
 
+@app.route('/api/download/pdf/<job_id>/<filename>', methods=['GET'])
+def download_pdf_file(job_id, filename):
+    """Download a single fetched PDF (inline; ?download=1 for an attachment)"""
+    files = download_files.get(job_id)
+    if files is None:
+        return jsonify({'error': 'Job files not found'}), 404
+    # Only files recorded for the job are served, so the name can't reach other paths
+    pdf_path = next((path for arcname, path, _, _ in files.get('pdfs', []) if arcname == filename), None)
+    if pdf_path is None or not os.path.exists(pdf_path):
+        return jsonify({'error': 'PDF file not found'}), 404
+    return send_file(pdf_path, mimetype='application/pdf', download_name=filename,
+                     as_attachment=request.args.get('download') == '1')
+
+@app.route('/api/download/profile/<job_id>', methods=['GET'])
+def download_profile(job_id):
+    """Download the profile of a fetch or processing job: collapsed stacks (.folded) or pstats (.pstats)"""
+    profile = job_profiles.get(job_id)
+    if profile is None or not os.path.exists(profile['path']):
+        return jsonify({'error': 'Profile not found'}), 404
+    mimetype = 'text/plain' if profile['mode'] == 'sample' else 'application/octet-stream'
+    return send_file(profile['path'], mimetype=mimetype, as_attachment=True,
+                     download_name=os.path.basename(profile['path']))
+
 # --- Process routes (PDF text extraction) ---
 
 @app.route('/api/process', methods=['POST'])
@@ -486,14 +1097,37 @@ def process_pdfs_upload():
     Expects multipart/form-data with:
       - 'pdfs': multiple PDF files
       - 'metadata_json': optional JSON metadata file
+      - 'output_format': optional 'json' or 'jsonl' (defaults to RELIEFWEB_OUTPUT_FORMAT)
+      - 'parquet': optional '1'/'0' to write the Parquet export (defaults to RELIEFWEB_PARQUET_EXPORT)
+      - 'profile': optional 'sample' or 'cprofile' to profile the job (see /api/download/profile/<job_id>)
     """
+    from pdf_processor import OUTPUT_FORMATS
+    from parquet_export import PARQUET_AVAILABLE
+
     if 'pdfs' not in request.files:
         return jsonify({'error': 'No PDF files uploaded'}), 400
 
+    output_format = request.form.get('output_format') or PROCESS_OUTPUT_FORMAT
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({'error': f"Unknown output_format '{output_format}' (expected one of {', '.join(OUTPUT_FORMATS)})"}), 400
+
+    parquet = request.form.get('parquet', '1' if PARQUET_EXPORT else '0').lower() in ('1', 'true', 'yes')
+    if parquet and not PARQUET_AVAILABLE:
+        return jsonify({'error': "Parquet export requires the 'pyarrow' package on the server"}), 400
+
+    try:
+        profile_mode = choose_profile_mode(request.form.get('profile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     pdf_files = request.files.getlist('pdfs')
     if not pdf_files:
         return jsonify({'error': 'No PDF files uploaded'}), 400
 
+    # Turn the job away before saving any uploads if it could not be queued
+    if not process_scheduler.has_capacity():
+        return queue_full_response(process_scheduler)
+
     # Create temp directory for this job
     job_id = str(uuid.uuid4())[:12]
     upload_dir = os.path.join(tempfile.gettempdir(), f'reliefweb_process_{job_id}')
@@ -521,7 +1155,7 @@ def process_pdfs_upload():
         json_file = request.files['metadata_json']
         if json_file.filename:
             try:
-                json_data = json.load(json_file)
+                json_data = serialization.loads(json_file.read())
             except Exception as e:
                 print(f"Warning: Could not parse metadata JSON: {e}")
 
@@ -530,70 +1164,172 @@ def process_pdfs_upload():
     print(f"PDFs: {len(pdf_files_info)}, Metadata JSON: {'Yes' if json_data else 'No'}")
     print(f"{'='*70}\n")
 
-    # Start background processing
-    thread = threading.Thread(
-        target=process_uploaded_pdfs_background,
-        args=(job_id, upload_dir, pdf_files_info, json_data),
-        daemon=True
-    )
-    thread.start()
+    # Queue background processing
+    try:
+        position = submit_job(
+            process_scheduler, job_id, profile_mode, process_status, process_uploaded_pdfs_background,
+            job_id, upload_dir, pdf_files_info, json_data, output_format, parquet
+        )
+    except QueueFullError:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return queue_full_response(process_scheduler)
 
-    return jsonify({'job_id': job_id, 'total_pdfs': len(pdf_files_info)})
+    return jsonify({'job_id': job_id, 'total_pdfs': len(pdf_files_info), 'output_format': output_format,
+                    'queue_position': position, 'profile': profile_mode})
 
 @app.route('/api/process/status/<job_id>', methods=['GET'])
 def get_process_status(job_id):
     """Get status of a processing job"""
-    if job_id not in process_status:
+    status = process_status.get(job_id)
+    if status is None:
         return jsonify({'error': 'Job not found'}), 404
-    return jsonify(process_status[job_id])
+    return jsonify(status)
+
+@app.route('/api/process/status/<job_id>/stream', methods=['GET'])
+def stream_process_status(job_id):
+    """Stream status updates of a processing job (Server-Sent Events)"""
+    return stream_job_status(process_status, job_id)
 
 @app.route('/api/process/download/<job_id>', methods=['GET'])
 def download_process_result(job_id):
-    """Download the full-text JSON result"""
-    if job_id not in process_files:
+    """
+    Download a full-text result file.
+    ?artifact= picks the file: 'json' for JSON output; 'articles', 'tables' or 'manifest'
+    for JSONL output; 'articles_parquet' or 'tables_parquet' for the Parquet export.
+    Defaults to the main file ('json' or 'articles').
+    """
+    files = process_files.get(job_id)
+    if files is None:
         return jsonify({'error': 'Job files not found'}), 404
-    files = process_files[job_id]
-    output_path = files.get('output_path')
-    if not output_path or not os.path.exists(output_path):
+    artifacts = files.get('artifacts', {})
+    artifact_name = request.args.get('artifact') or next(iter(artifacts), None)
+    artifact = artifacts.get(artifact_name)
+    if artifact is None:
+        return jsonify({'error': f"Unknown artifact '{artifact_name}'", 'artifacts': list(artifacts)}), 404
+    if not os.path.exists(artifact['path']):
         return jsonify({'error': 'Output file not found'}), 404
-    return send_file(output_path, as_attachment=True, download_name=files.get('output_filename', 'full_text.json'))
+    return send_output_file(artifact['path'], artifact['filename'])
 
-# --- Common routes ---
+# --- Search routes ---
 
-@app.route('/api/countries', methods=['GET'])
-def get_countries():
-    """Get list of countries from ReliefWeb API"""
+def reindex_data_dir_background(job_id, data_dir, force):
+    """Background task to (re)index every data folder for search."""
     try:
-        url = "https://api.reliefweb.int/v1/countries"
-        params = {
-            "appname": "ISI_Scraping_1234BjV0393fyHx2S2OQ",
-            "limit": 1000,
-            "fields[include][]": ["name", "iso3", "id"]
-        }
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-
-        countries = []
-        for country in data.get('data', []):
-            fields = country.get('fields', {})
-            iso3 = fields.get('iso3', '')
-            name = fields.get('name', '')
-            if iso3 and name:
-                countries.append({'code': iso3, 'name': name})
+        process_status[job_id] = {'status': 'processing', 'progress': 0, 'message': f'Indexing {data_dir}...'}
 
-        countries.sort(key=lambda x: x['name'])
-        return jsonify(countries)
+        def report_indexed(done, total, folder_name):
+            process_status.patch(job_id, {
+                'progress': int(done / max(total, 1) * 100),
+                'message': f'Indexed folder {done}/{total}: {folder_name[:50]}'
+            })
 
+        stats = search_index.index_data_dir(data_dir, force, report_indexed)
+        process_status[job_id] = dict(stats, status='completed', progress=100, message='Indexing complete!')
+        print(f"[INDEX {job_id}] COMPLETED - {stats}")
     except Exception as e:
-        print(f"Error fetching countries: {e}")
-        return jsonify([
+        print(f"[INDEX {job_id}] ERROR: {e}")
+        process_status[job_id] = {'status': 'error', 'progress': 0, 'message': f'Error: {str(e)}'}
+
+@app.route('/api/search', methods=['GET'])
+def search_reports():
+    """
+    Full-text search over indexed reports.
+    Query parameters: q (FTS5 syntax, e.g. "exact phrase"), disaster, country, source,
+    date_from, date_to (YYYY-MM-DD), limit, offset.
+    """
+    if search_index is None:
+        return jsonify({'error': 'Search index is disabled'}), 404
+    try:
+        results = search_index.search(
+            request.args.get('q', ''),
+            disaster=request.args.get('disaster'),
+            country=request.args.get('country'),
+            source=request.args.get('source'),
+            date_from=request.args.get('date_from'),
+            date_to=request.args.get('date_to'),
+            limit=request.args.get('limit', 20),
+            offset=request.args.get('offset', 0)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(results)
+
+@app.route('/api/search/reindex', methods=['POST'])
+def reindex_search():
+    """
+    Index every data folder (RELIEFWEB_OUTPUT_DIR, or 'data_dir' in the body) in the background.
+    Unchanged folders are skipped unless 'force' is set. Track it with /api/process/status/<job_id>.
+    """
+    if search_index is None:
+        return jsonify({'error': 'Search index is disabled'}), 404
+    data = request.get_json(silent=True) or {}
+    data_dir = data.get('data_dir', DATA_DIR)
+    job_id = f"index_{uuid.uuid4().hex[:12]}"
+    try:
+        position = process_scheduler.submit(
+            job_id, reindex_data_dir_background, job_id, data_dir, bool(data.get('force', False))
+        )
+    except QueueFullError:
+        return queue_full_response(process_scheduler)
+    return jsonify({'job_id': job_id, 'queue_position': position})
+
+# --- Common routes ---
+
+def fetch_countries():
+    """Fetch the list of countries from the ReliefWeb API, sorted by name"""
+    url = f"{API_URL}/countries"
+    params = {
+        "appname": API_APPNAME,
+        "limit": 1000,
+        "fields[include][]": ["name", "iso3", "id"]
+    }
+    response = requests.get(url, params=params, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+
+    countries = []
+    for country in data.get('data', []):
+        fields = country.get('fields', {})
+        iso3 = fields.get('iso3', '')
+        name = fields.get('name', '')
+        if iso3 and name:
+            countries.append({'code': iso3, 'name': name})
+
+    countries.sort(key=lambda x: x['name'])
+    return countries
+
+countries_cache = ResourceCache('countries', fetch_countries, COUNTRIES_TTL_SECONDS,
+                                path=COUNTRIES_CACHE_PATH if SERVER_PROCESS and COUNTRIES_CACHE_PATH else None)
+
+@app.route('/api/countries', methods=['GET'])
+def get_countries():
+    """Get list of countries from ReliefWeb API (cached, refreshed in the background)"""
+    entry = countries_cache.get()
+    if entry is None:
+        # Nothing fetched yet and ReliefWeb is unreachable: a short list browsers must not keep
+        response = jsonify([
             {'code': 'HTI', 'name': 'Haiti'},
             {'code': 'USA', 'name': 'United States'},
             {'code': 'PHL', 'name': 'Philippines'},
             {'code': 'NPL', 'name': 'Nepal'},
             {'code': 'PAK', 'name': 'Pakistan'}
         ])
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    max_age = min(countries_cache.max_age(entry), COUNTRIES_BROWSER_MAX_AGE)
+    if entry.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, content_type='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics of the server, summed over its worker processes"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -601,7 +1337,13 @@ def health_check():
     return jsonify({
         'status': 'online',
         'message': 'ReliefWeb Fetcher API is running',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'json_backend': serialization.JSON_BACKEND,
+        'search_index': search_index.stats() if search_index is not None else None,
+        'queues': {
+            'fetch': fetch_scheduler.stats(),
+            'process': process_scheduler.stats()
+        }
     })
 
 # Serve the HTML page directly
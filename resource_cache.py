@@ -0,0 +1,135 @@
+"""
+Resource Cache
+Keeps a slow-changing upstream resource (e.g. the ReliefWeb countries list) in
+memory as ready-to-send JSON, refreshes it in the background once it is stale,
+and persists it to disk so a restarted server can answer straight away.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import serialization
+
+
+class CachedEntry:
+    """One loaded version of the resource, encoded once for every response."""
+
+    __slots__ = ('value', 'body', 'etag', 'fetched_at')
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.body = serialization.dumps(value, compact=True)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class ResourceCache:
+    """
+    TTL cache with stale-while-revalidate.
+
+    Only the very first load (nothing in memory or on disk) runs in the request
+    thread. After that get() always answers from memory: once the entry is older
+    than ttl, the stale entry is still returned while a single background thread
+    reloads it. Failed loads keep the old entry and are retried after retry_after
+    seconds.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], ttl: float,
+                 path: Optional[str] = None, retry_after: float = 60):
+        """
+        Args:
+            name: Name used in log messages
+            loader: Fetches the current value; raises on failure
+            ttl: Seconds after which the value is refreshed
+            path: JSON file the value is persisted to (None keeps it in memory only)
+            retry_after: Seconds between attempts after a failed load
+        """
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.retry_after = retry_after
+        self._entry = self._read_disk()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._failed_at = None
+
+    def _read_disk(self) -> Optional[CachedEntry]:
+        if self.path is None:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                data = serialization.loads(f.read())
+            return CachedEntry(data['value'], data['fetched_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_disk(self, entry: CachedEntry):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(serialization.dumps({'fetched_at': entry.fetched_at, 'value': entry.value}, compact=True))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: could not persist {self.name} cache to {self.path}: {e}")
+
+    def _load(self) -> Optional[CachedEntry]:
+        try:
+            entry = CachedEntry(self.loader(), time.time())
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            print(f"Error refreshing {self.name}: {e}")
+            return None
+        self._failed_at = None
+        self._entry = entry
+        self._write_disk(entry)
+        return entry
+
+    def _may_retry(self) -> bool:
+        return self._failed_at is None or time.monotonic() - self._failed_at >= self.retry_after
+
+    def _refresh_in_background(self):
+        try:
+            self._load()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self) -> Optional[CachedEntry]:
+        """
+        Current entry, loading it in the calling thread only if there is none yet.
+
+        Returns:
+            Optional[CachedEntry]: None if nothing has ever loaded and the load failed
+        """
+        entry = self._entry
+        if entry is None:
+            with self._lock:
+                # Concurrent first requests wait for a single load
+                if self._entry is None and self._may_retry():
+                    self._load()
+                return self._entry
+
+        if entry.age >= self.ttl and not self._refreshing:
+            with self._lock:
+                if self._refreshing or not self._may_retry():
+                    return entry
+                self._refreshing = True
+            threading.Thread(target=self._refresh_in_background, name=f"{self.name}-refresh", daemon=True).start()
+        return entry
+
+    def max_age(self, entry: CachedEntry) -> int:
+        """Seconds until entry is due for a refresh (0 if it already is)."""
+        return max(0, int(self.ttl - entry.age))
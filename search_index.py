@@ -0,0 +1,516 @@
+"""
+Full-Text Search Index
+Incremental SQLite FTS5 index over processed reports, fed by process_pdfs as articles
+are written and by scanning data folders, with ranked, filtered search and snippets.
+"""
+
+import hashlib
+import html
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
+
+import serialization
+
+# bm25 column weights: matches in the title count most, then the report body, then the PDF text
+BM25_WEIGHTS = (10.0, 1.0, 2.0)
+
+# Tokens around each match in a snippet
+SNIPPET_TOKENS = 24
+
+MAX_SEARCH_LIMIT = 100
+
+# Bump when documents are keyed or stored differently; older indexes are cleared on open
+INDEX_VERSION = 2
+
+# Sentinels placed around matches by snippet(), swapped for <mark> after HTML-escaping
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# Full-text outputs looked for in a data folder, newest first; the fetch metadata is the fallback
+FULLTEXT_PATTERNS = ('*.manifest.json', '*full_text*.json', '*full_text*.json.*',
+                     '*fulltext*.json', '*fulltext*.json.*')
+METADATA_PATTERN = '*_reports.json'
+
+
+def _article_date(article: Dict[str, Any]) -> Optional[str]:
+    """
+    Publication date of an article as YYYY-MM-DD (original date, else created).
+    """
+    date_info = article.get('date') or {}
+    for value in (date_info.get('original'), date_info.get('created')):
+        if isinstance(value, str) and _DATE_RE.match(value):
+            return value[:10]
+    return None
+
+
+def _plain_text(value: str) -> str:
+    """
+    Strip HTML markup (report bodies from the API are HTML) so tags are neither indexed nor shown in snippets.
+    """
+    if not value or '<' not in value:
+        return value or ''
+    return html.unescape(_HTML_TAG_RE.sub(' ', value))
+
+
+def _quote_terms(query: str) -> str:
+    """
+    Turn free text into an FTS5 query matching every word, for input that is not valid FTS5 syntax.
+    """
+    terms = [term.replace('"', '""') for term in query.split()]
+    return ' '.join(f'"{term}"' for term in terms if term)
+
+
+class CorpusIndexer:
+    """
+    Indexes the articles of one corpus (a data folder or processing job) as they are written.
+
+    Has the write_article / write_tables / close / abort interface of the
+    full-text writers in pdf_processor, so process_pdfs can feed it alongside them.
+    Articles whose content is unchanged since the last run are skipped; on close,
+    documents of the corpus that were not seen again are removed.
+
+    With attach=True (processing jobs), reports already indexed under another
+    corpus, such as the data folder they were fetched into, are updated in place
+    and stay in that corpus; only reports new to the index belong to this one.
+    """
+
+    def __init__(self, index: 'SearchIndex', corpus: str, header: Dict[str, Any], path: str = '',
+                 attach: bool = False):
+        self.index = index
+        self.corpus = corpus
+        self.header = header
+        self.path = path
+        self.attach = attach
+        self.n_indexed = 0
+        self.n_unchanged = 0
+        self._seen_ids = set()
+        self._seen_keys = set()
+
+    def write_article(self, article: Dict[str, Any]):
+        doc_key = self.index._doc_key(article)
+        # Further PDFs of a report already written in this run are added to its document
+        merge = doc_key in self._seen_keys
+        self._seen_keys.add(doc_key)
+        doc_id, changed = self.index._upsert(self.corpus, self.header, article, self.attach, merge)
+        self._seen_ids.add(doc_id)
+        if changed:
+            self.n_indexed += 1
+        else:
+            self.n_unchanged += 1
+
+    def write_tables(self, pdf_filename: str, tables: list):
+        # Table cells are not indexed; their text is excluded from pdf_text on purpose
+        pass
+
+    def close(self, processing_metadata: Dict[str, Any] = None, signature: Optional[str] = None) -> Dict[str, str]:
+        removed = self.index._finish_corpus(self.corpus, self._seen_ids, self.path, signature)
+        print(f"Search index: {self.corpus}: {self.n_indexed} indexed, "
+              f"{self.n_unchanged} unchanged, {removed} removed")
+        return {}
+
+    def abort(self):
+        # Articles indexed so far stay searchable; stale ones are removed on the next full run
+        pass
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 index of articles, with their disaster, country, sources and date for filtering.
+
+    Each thread keeps its own connection; WAL mode lets searches run while
+    processing jobs add documents.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                doc_key TEXT NOT NULL UNIQUE,
+                corpus TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                disaster TEXT,
+                disaster_type TEXT,
+                country TEXT,
+                iso2 TEXT,
+                title TEXT,
+                url TEXT,
+                pdf_filename TEXT,
+                has_pdf INTEGER,
+                language TEXT,
+                date TEXT,
+                sources TEXT
+            );
+            CREATE INDEX IF NOT EXISTS documents_corpus ON documents (corpus);
+            CREATE INDEX IF NOT EXISTS documents_date ON documents (date);
+            CREATE TABLE IF NOT EXISTS document_sources (
+                doc_id INTEGER NOT NULL,
+                source TEXT NOT NULL COLLATE NOCASE
+            );
+            CREATE INDEX IF NOT EXISTS document_sources_source ON document_sources (source, doc_id);
+            CREATE INDEX IF NOT EXISTS document_sources_doc ON document_sources (doc_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                title, body_text, pdf_text, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS corpora (
+                corpus TEXT PRIMARY KEY,
+                path TEXT,
+                signature TEXT,
+                n_documents INTEGER,
+                indexed_at REAL
+            );
+        """)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < INDEX_VERSION:
+            if conn.execute("SELECT count(*) FROM documents").fetchone()[0]:
+                conn.executescript("""
+                    DELETE FROM documents_fts;
+                    DELETE FROM document_sources;
+                    DELETE FROM documents;
+                    DELETE FROM corpora;
+                """)
+                print(f"Search index: {db_path} was built by an older version and has been cleared; "
+                      f"POST /api/search/reindex rebuilds it from the data folders")
+            conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Indexing ---
+
+    def corpus_indexer(self, corpus: str, header: Dict[str, Any], path: str = '',
+                       attach: bool = False) -> CorpusIndexer:
+        """
+        Start (re)indexing a corpus. header holds the event fields from pdf_processor.output_header.
+        """
+        return CorpusIndexer(self, corpus, header, path, attach)
+
+    @staticmethod
+    def _doc_key(article: Dict[str, Any]) -> str:
+        # One document per report, whichever folder or job indexed it; PDFs matched
+        # to no report are told apart by file name
+        if article.get('url'):
+            return article['url']
+        return f"#{article.get('title', '')}#{article.get('pdf_filename', '')}"
+
+    def _delete(self, conn, doc_id):
+        conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (doc_id,))
+        conn.execute("DELETE FROM document_sources WHERE doc_id = ?", (doc_id,))
+        conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+    def _upsert(self, corpus: str, header: Dict[str, Any], article: Dict[str, Any],
+                attach: bool = False, merge: bool = False) -> tuple:
+        """
+        Add or replace one article. Returns (document id, whether its content changed).
+
+        A report indexed with its PDF text is never replaced by the same report
+        without it (e.g. from the fetch metadata of a later run). With attach, a
+        document indexed under another corpus keeps that corpus; with merge, the
+        article's PDF is added to the document's PDFs instead of replacing them.
+        """
+        doc_key = self._doc_key(article)
+        disaster = header.get('query') or header.get('disaster_type') or ''
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT d.id, d.content_hash, d.corpus, d.has_pdf, d.pdf_filename, f.pdf_text"
+                " FROM documents d JOIN documents_fts f ON f.rowid = d.id WHERE d.doc_key = ?", (doc_key,)
+            ).fetchone()
+            if row and row[3] and not article.get('has_pdf'):
+                conn.execute("COMMIT")
+                return row[0], False
+            if row and merge and row[3]:
+                article = dict(article, pdf_filename=f"{row[4]}, {article.get('pdf_filename', '')}",
+                               pdf_text=f"{row[5]}\n\n{article.get('pdf_text', '')}")
+            if row and attach:
+                corpus = row[2]
+            content_hash = hashlib.sha1(
+                serialization.dumps([corpus, disaster, header.get('country'), header.get('iso2'), article],
+                                    compact=True)
+            ).hexdigest()
+            if row and row[1] == content_hash:
+                conn.execute("COMMIT")
+                return row[0], False
+            if row:
+                self._delete(conn, row[0])
+
+            sources = [str(s) for s in article.get('sources') or []]
+            cursor = conn.execute(
+                "INSERT INTO documents (doc_key, corpus, content_hash, disaster, disaster_type, country, iso2,"
+                " title, url, pdf_filename, has_pdf, language, date, sources)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_key, corpus, content_hash, disaster, header.get('disaster_type', ''),
+                 header.get('country', ''), header.get('iso2', ''), article.get('title', ''),
+                 article.get('url', ''), article.get('pdf_filename', ''), int(bool(article.get('has_pdf'))),
+                 article.get('language', ''), _article_date(article), serialization.dumps(sources, compact=True))
+            )
+            doc_id = cursor.lastrowid
+            conn.execute(
+                "INSERT INTO documents_fts (rowid, title, body_text, pdf_text) VALUES (?, ?, ?, ?)",
+                (doc_id, article.get('title', ''), _plain_text(article.get('body_text', '')), article.get('pdf_text', ''))
+            )
+            conn.executemany(
+                "INSERT INTO document_sources (doc_id, source) VALUES (?, ?)",
+                [(doc_id, source) for source in dict.fromkeys(sources)]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return doc_id, True
+
+    def _finish_corpus(self, corpus: str, seen_ids: set, path: str, signature: Optional[str]) -> int:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stale = [row[0] for row in conn.execute("SELECT id FROM documents WHERE corpus = ?", (corpus,))
+                     if row[0] not in seen_ids]
+            for doc_id in stale:
+                self._delete(conn, doc_id)
+            conn.execute(
+                "INSERT OR REPLACE INTO corpora (corpus, path, signature, n_documents, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (corpus, path, signature, len(seen_ids), time.time())
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(stale)
+
+    def drop_corpus(self, corpus: str) -> int:
+        """
+        Remove a corpus and the documents it owns (not those attached to other corpora).
+        Returns the number of documents removed.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            doc_ids = [row[0] for row in conn.execute("SELECT id FROM documents WHERE corpus = ?", (corpus,))]
+            for doc_id in doc_ids:
+                self._delete(conn, doc_id)
+            conn.execute("DELETE FROM corpora WHERE corpus = ?", (corpus,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(doc_ids)
+
+    def index_articles(self, corpus: str, header: Dict[str, Any], articles, path: str = '',
+                       signature: Optional[str] = None) -> int:
+        """
+        Index a whole corpus from an iterable of articles. Returns the number of articles seen.
+        """
+        indexer = self.corpus_indexer(corpus, header, path)
+        for article in articles:
+            indexer.write_article(article)
+        indexer.close(signature=signature)
+        return indexer.n_indexed + indexer.n_unchanged
+
+    @staticmethod
+    def _folder_source(folder: Path) -> Optional[Path]:
+        for patterns in (FULLTEXT_PATTERNS, (METADATA_PATTERN,)):
+            candidates = {p for pattern in patterns for p in folder.glob(pattern) if p.is_file()}
+            if candidates:
+                return max(candidates, key=lambda p: p.stat().st_mtime)
+        return None
+
+    @staticmethod
+    def _read_source(path: Path) -> tuple:
+        """
+        Load the header and articles of a full-text output (JSON, JSONL manifest) or fetch metadata JSON.
+        Returns (header, iterator of articles).
+        """
+        from pdf_processor import output_header, articles_without_pdfs
+
+        if path.name.endswith('.manifest.json'):
+            with open(path, 'rb') as f:
+                manifest = serialization.loads(f.read())
+            articles_path = path.parent / manifest['articles_file']
+
+            def iter_lines() -> Iterator[Dict[str, Any]]:
+                with serialization.open_decoded(articles_path) as f:
+                    for line in f:
+                        if line.strip():
+                            yield serialization.loads(line)
+
+            return manifest, iter_lines()
+
+        with serialization.open_decoded(path) as f:
+            data = serialization.loads(f.read())
+        if 'articles' in data:
+            return data, iter(data['articles'])
+        # Fetch metadata only: index the reports' own text until the PDFs are processed
+        return output_header(data), articles_without_pdfs(data.get('reports', []), set())
+
+    def index_folder(self, folder: str, force: bool = False) -> Optional[int]:
+        """
+        Index a data folder from its newest full-text output, or its fetch metadata JSON.
+        Folders whose source file is unchanged since the last run are skipped.
+
+        Returns:
+            Optional[int]: Number of articles seen, or None if skipped
+        """
+        folder = Path(folder)
+        source = self._folder_source(folder)
+        if source is None:
+            return None
+        stat = source.stat()
+        signature = f"{source.name}:{stat.st_size}:{stat.st_mtime_ns}"
+        corpus = folder.name
+
+        row = self._connection().execute(
+            "SELECT signature FROM corpora WHERE corpus = ?", (corpus,)
+        ).fetchone()
+        if row and row[0] == signature and not force:
+            return None
+
+        header, articles = self._read_source(source)
+        return self.index_articles(corpus, header, articles, str(source), signature)
+
+    def index_data_dir(self, data_dir: str, force: bool = False, progress_callback=None) -> Dict[str, int]:
+        """
+        Index every data folder under data_dir, skipping unchanged ones.
+        progress_callback(done, total, folder_name) is called after each folder.
+        """
+        data_dir = Path(data_dir)
+        folders = sorted(p for p in data_dir.iterdir() if p.is_dir()) if data_dir.is_dir() else []
+        stats = {"folders": len(folders), "indexed_folders": 0, "skipped_folders": 0, "articles": 0}
+        for done, folder in enumerate(folders, 1):
+            try:
+                seen = self.index_folder(folder, force)
+            except Exception as e:
+                print(f"Search index: could not index {folder}: {e}")
+                seen = None
+            if seen is None:
+                stats['skipped_folders'] += 1
+            else:
+                stats['indexed_folders'] += 1
+                stats['articles'] += seen
+            if progress_callback:
+                progress_callback(done, len(folders), folder.name)
+        return stats
+
+    # --- Search ---
+
+    def search(self, query: str, disaster: Optional[str] = None, country: Optional[str] = None,
+               source: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """
+        Ranked search. query uses FTS5 syntax ("exact phrase", AND/OR/NOT, prefix*);
+        text that is not valid FTS5 syntax is searched as all of its words.
+
+        Filters: disaster (substring of the disaster name or type), country (name or
+        ISO code), source (exact name), date_from/date_to (YYYY-MM-DD, inclusive).
+
+        Returns:
+            Dict with total, results (best first, each with an HTML snippet) and took_ms
+
+        Raises:
+            ValueError: if the query is empty
+        """
+        started = time.perf_counter()
+        query = (query or '').strip()
+        if not query:
+            raise ValueError("Search query is empty")
+        limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+        offset = max(0, int(offset))
+
+        filters = []
+        params = []
+        if disaster:
+            filters.append("(d.disaster LIKE ? OR d.disaster_type LIKE ?)")
+            params += [f"%{disaster}%"] * 2
+        if country:
+            filters.append("(d.country = ? COLLATE NOCASE OR d.iso2 = ? COLLATE NOCASE)")
+            params += [country, country]
+        if source:
+            filters.append("d.id IN (SELECT doc_id FROM document_sources WHERE source = ?)")
+            params.append(source)
+        if date_from:
+            filters.append("d.date >= ?")
+            params.append(date_from[:10])
+        if date_to:
+            filters.append("d.date <= ?")
+            params.append(date_to[:10])
+        where = ''.join(f" AND {f}" for f in filters)
+
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        select_sql = (
+            f"SELECT d.title, d.url, d.pdf_filename, d.has_pdf, d.disaster, d.country, d.iso2, d.language,"
+            f" d.date, d.sources, d.corpus, bm25(documents_fts, {weights}) AS score,"
+            f" snippet(documents_fts, -1, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS})"
+            f" FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+            f" WHERE documents_fts MATCH ?{where} ORDER BY score LIMIT ? OFFSET ?"
+        )
+        count_sql = (
+            f"SELECT count(*) FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+            f" WHERE documents_fts MATCH ?{where}"
+        )
+
+        conn = self._connection()
+        match = query
+        try:
+            rows = conn.execute(select_sql, [match] + params + [limit, offset]).fetchall()
+        except sqlite3.OperationalError:
+            match = _quote_terms(query)
+            rows = conn.execute(select_sql, [match] + params + [limit, offset]).fetchall()
+        total = conn.execute(count_sql, [match] + params).fetchone()[0]
+
+        results = []
+        for (title, url, pdf_filename, has_pdf, disaster_name, country_name, iso2, language,
+             date, sources, corpus, score, snippet) in rows:
+            snippet = html.escape(snippet or '').replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+            results.append({
+                "title": title,
+                "url": url,
+                "pdf_filename": pdf_filename,
+                "has_pdf": bool(has_pdf),
+                "disaster": disaster_name,
+                "country": country_name,
+                "iso2": iso2,
+                "language": language,
+                "date": date,
+                "sources": serialization.loads(sources) if sources else [],
+                "corpus": corpus,
+                "score": round(-score, 6),
+                "snippet": snippet
+            })
+
+        return {
+            "query": query,
+            "fts_query": match,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "results": results,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Number of indexed documents and corpora.
+        """
+        conn = self._connection()
+        return {
+            "documents": conn.execute("SELECT count(*) FROM documents").fetchone()[0],
+            "corpora": conn.execute("SELECT count(*) FROM corpora").fetchone()[0]
+        }
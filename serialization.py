@@ -0,0 +1,146 @@
+"""
+JSON Serialization
+Encodes output files with orjson when it is installed (falling back to the standard
+library json module), with an optional compact layout and gzip/zstd compression.
+"""
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Name of the encoder in use, reported in processing metadata and /api/health
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# Compression name -> (file suffix, HTTP Content-Encoding)
+COMPRESSIONS = {
+    'gzip': ('.gz', 'gzip'),
+    'zstd': ('.zst', 'zstd')
+}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def dumps(obj: Any, compact: bool = False) -> bytes:
+    """
+    Encode obj as UTF-8 JSON: indented by 2 spaces, or on one line if compact.
+
+    Non-ASCII characters are written as-is, like json.dump(..., ensure_ascii=False).
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, option=option)
+        except (TypeError, orjson.JSONEncodeError):
+            # Values orjson rejects (e.g. integers beyond 64 bits) still go through json
+            pass
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def dumps_line(obj: Any) -> bytes:
+    """
+    Encode obj as one compact JSON Lines record, newline included.
+    """
+    return dumps(obj, compact=True) + b'\n'
+
+
+def loads(data) -> Any:
+    """
+    Decode JSON from bytes or str.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def check_compression(compression: Optional[str]) -> Optional[str]:
+    """
+    Validate a compression name, returning None for no compression.
+
+    Raises:
+        ValueError: if the name is unknown or its library is not installed
+    """
+    if compression in (None, '', 'none'):
+        return None
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}' (expected none, {', '.join(COMPRESSIONS)})")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package")
+    return compression
+
+
+def compressed_path(path: Path, compression: Optional[str]) -> Path:
+    """
+    Path of the file actually written for path under the given compression.
+    """
+    path = Path(path)
+    compression = check_compression(compression)
+    if compression is None:
+        return path
+    return path.with_name(path.name + COMPRESSIONS[compression][0])
+
+
+def open_output(path: Path, compression: Optional[str] = None) -> BinaryIO:
+    """
+    Open a file for binary writing, compressing on the fly.
+    Pass the path from compressed_path() so the suffix matches the compression.
+    """
+    compression = check_compression(compression)
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=GZIP_LEVEL)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, 'wb'), closefd=True)
+    return open(path, 'wb')
+
+
+def dump(obj: Any, path: Path, compact: bool = False, compression: Optional[str] = None) -> Path:
+    """
+    Write obj as JSON to path (plus the compression suffix).
+
+    Returns:
+        Path: the file written
+    """
+    path = compressed_path(path, compression)
+    with open_output(path, compression) as f:
+        f.write(dumps(obj, compact))
+    return path
+
+
+def content_encoding(path: Path) -> Optional[str]:
+    """
+    HTTP Content-Encoding of a file written by this module, from its suffix.
+    """
+    suffix = Path(path).suffix
+    for file_suffix, encoding in COMPRESSIONS.values():
+        if suffix == file_suffix:
+            return encoding
+    return None
+
+
+def open_decoded(path: Path) -> BinaryIO:
+    """
+    Open a file written by this module for reading, decompressing it if needed.
+    """
+    encoding = content_encoding(path)
+    if encoding == 'gzip':
+        return gzip.open(path, 'rb')
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise ValueError("Reading zstd files requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
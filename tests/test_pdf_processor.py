@@ -0,0 +1,86 @@
+"""
+Ordered, windowed fan-out of extraction tasks in iter_extracted_pdfs.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pdf_processor
+
+
+def test_slow_first_pdf_does_not_buffer_the_corpus(monkeypatch):
+    """PDFs finishing behind a slow first one wait in a window of ~2 * workers tasks."""
+    workers = 2
+    pdf_paths = [Path(f"report_{i}.pdf") for i in range(40)]
+    lock = threading.Lock()
+    started = []
+    yielded = []
+    peak_ahead = 0
+
+    def fake_task(pdf_path, pages, profile_settings, signature=False):
+        nonlocal peak_ahead
+        with lock:
+            started.append(pdf_path)
+            peak_ahead = max(peak_ahead, len(started) - len(yielded))
+        if pdf_path == pdf_paths[0]:
+            time.sleep(0.5)
+        return ([f"text of {pdf_path.name}"], [], {'pages': 1}, None), None
+
+    monkeypatch.setattr(pdf_processor, '_extract_task', fake_task)
+    monkeypatch.setattr(pdf_processor, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+
+    for idx, pdf_path, pdf_text, _, _ in pdf_processor.iter_extracted_pdfs(pdf_paths, workers=workers):
+        with lock:
+            yielded.append(pdf_path)
+        assert pdf_text == f"text of {pdf_path.name}"
+
+    assert yielded == pdf_paths
+    # Without a window all 40 tasks would be submitted (and their results held) at once
+    assert peak_ahead <= 2 * workers
+
+
+def test_page_ranges_of_next_pdf_are_not_held_back_by_the_window(monkeypatch):
+    """A PDF split into more page ranges than the window still completes."""
+    pdf_paths = [Path("long.pdf"), Path("short.pdf")]
+
+    def fake_task(pdf_path, pages, profile_settings, signature=False):
+        text = [f"{pdf_path.name} {pages[0]}-{pages[1]}"] if pages else [pdf_path.name]
+        return (text, [], {'pages': 1}, None), None
+
+    monkeypatch.setattr(pdf_processor, '_extract_task', fake_task)
+    monkeypatch.setattr(pdf_processor, 'count_pdf_pages', lambda path: 100 if path.name == 'long.pdf' else 2)
+    monkeypatch.setattr(pdf_processor, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+
+    results = list(pdf_processor.iter_extracted_pdfs(pdf_paths, workers=2, pages_per_task=10))
+
+    assert [pdf_path for _, pdf_path, _, _, _ in results] == pdf_paths
+    assert results[0][2] == '\n\n'.join(f"long.pdf {first}-{first + 9}" for first in range(1, 100, 10))
+
+
+def test_signatures_match_the_detector_whether_computed_in_workers_or_not(monkeypatch):
+    """Signatures come from the worker for whole PDFs and from the parent for split ones."""
+    from near_duplicates import text_signature
+
+    pdf_paths = [Path("long.pdf"), Path("short.pdf")]
+    signed_in_worker = []
+
+    def fake_task(pdf_path, pages, profile_settings, signature=False):
+        text = [f"{pdf_path.name} page range {pages} has a few more words"]
+        if signature:
+            signed_in_worker.append(pdf_path)
+        return (text, [], {'pages': 1}, text_signature(text[0]) if signature else None), None
+
+    monkeypatch.setattr(pdf_processor, '_extract_task', fake_task)
+    monkeypatch.setattr(pdf_processor, 'count_pdf_pages', lambda path: 30 if path.name == 'long.pdf' else 2)
+    monkeypatch.setattr(pdf_processor, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+
+    results = list(pdf_processor.iter_extracted_pdfs(pdf_paths, workers=2, pages_per_task=10, signatures=True))
+
+    assert signed_in_worker == [Path("short.pdf")]
+    for _, _, pdf_text, _, signature in results:
+        assert signature == text_signature(pdf_text)
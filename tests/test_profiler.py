@@ -0,0 +1,46 @@
+"""
+Profiles of processing jobs must show PDF extraction, which runs in worker processes.
+"""
+
+import pstats
+from pathlib import Path
+
+import pdfplumber
+import pytest
+
+from pdf_processor import iter_extracted_pdfs
+from profiler import profile_call
+
+PDF_DIR = Path(__file__).resolve().parent.parent / 'reliefweb_data' / 'Marburg_Disease_Outbreak_eth_20260212_141152' / 'pdfs'
+PDF_PATHS = sorted(PDF_DIR.glob('*IntlMedCorps*.pdf'))[:3]
+PDFPLUMBER_DIR = Path(pdfplumber.__file__).resolve().parent
+
+pytestmark = pytest.mark.skipif(len(PDF_PATHS) < 3, reason='sample PDFs not available')
+
+
+def extract_all():
+    for _ in iter_extracted_pdfs(PDF_PATHS, workers=2):
+        pass
+
+
+def test_sample_profile_includes_worker_extraction(tmp_path):
+    path = tmp_path / 'job.folded'
+    summary = profile_call('sample', path, extract_all, interval=0.002)
+
+    assert summary['worker_tasks'] == len(PDF_PATHS)
+    assert summary['worker_samples'] > 0
+    # Frames are 'function (file.py:line)'; look for pdfplumber code called from _extract_pages
+    pdfplumber_files = {f"({p.name}:" for p in PDFPLUMBER_DIR.rglob('*.py')}
+    called = [stack.split('_extract_pages (pdf_processor.py', 1)[1]
+              for stack in path.read_text(encoding='utf-8').splitlines()
+              if '_extract_pages (pdf_processor.py' in stack]
+    assert any(name in frames for frames in called for name in pdfplumber_files)
+
+
+def test_cprofile_profile_includes_worker_extraction(tmp_path):
+    path = tmp_path / 'job.pstats'
+    summary = profile_call('cprofile', path, extract_all)
+
+    assert summary['worker_tasks'] == len(PDF_PATHS)
+    filenames = {filename for filename, _, _ in pstats.Stats(str(path)).stats}
+    assert any(Path(filename).resolve().is_relative_to(PDFPLUMBER_DIR) for filename in filenames if filename != '~')
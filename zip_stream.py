@@ -0,0 +1,267 @@
+"""
+Streaming ZIP Archives
+Builds ZIP archives on request from files already on disk, without writing an archive file.
+PDFs are stored uncompressed (they are compressed already); small in-memory members such as
+the metadata JSON are deflated. The layout, and so the total size, is known before the
+first byte is sent, and any byte range of the archive can be produced on its own.
+"""
+
+import hashlib
+import os
+import struct
+import time
+import zlib
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+READ_CHUNK_SIZE = 256 * 1024
+
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_COUNT_LIMIT = 0xFFFF
+_UTF8_FLAG = 0x800
+_UNIX_FILE_ATTR = (0o100644 << 16)
+
+
+def crc32_of_file(path: str) -> int:
+    """
+    CRC-32 of a file's contents, read in chunks.
+    """
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+@lru_cache(maxsize=8)
+def _deflate(data: bytes) -> Tuple[bytes, int]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data)
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class _Entry:
+    __slots__ = ('arcname', 'method', 'crc', 'compressed_size', 'size', 'mtime', 'path', 'data', 'offset')
+
+    def __init__(self, arcname, method, crc, compressed_size, size, mtime, path=None, data=None):
+        self.arcname = arcname
+        self.method = method
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.size = size
+        self.mtime = mtime
+        self.path = path
+        self.data = data
+        self.offset = 0
+
+
+class ZipStream:
+    """
+    ZIP archive assembled from files on disk and in-memory members.
+
+    Add members, then read size/etag/last_modified and stream the archive
+    (or a byte range of it) with iter_range(). Entries switch to ZIP64
+    records when sizes or offsets need it.
+    """
+
+    def __init__(self):
+        self._entries: List[_Entry] = []
+        self._names = set()
+        self._segments = None
+        self._size = None
+
+    def add_file(self, arcname: str, path: str, size: Optional[int] = None, crc32: Optional[int] = None) -> bool:
+        """
+        Add a file stored uncompressed. size/crc32 recorded when the file was written avoid
+        re-reading it; they are recomputed if the file on disk no longer matches the size.
+
+        Returns:
+            bool: False if the file is missing or the name is already in the archive
+        """
+        if arcname in self._names:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if crc32 is None or size != stat.st_size:
+            crc32 = crc32_of_file(path)
+        self._add(_Entry(arcname, ZIP_STORED, crc32, stat.st_size, stat.st_size, stat.st_mtime, path=path))
+        return True
+
+    def add_bytes(self, arcname: str, data: bytes, mtime: Optional[float] = None, compress: bool = True) -> bool:
+        """
+        Add an in-memory member, deflated unless compress is False.
+        """
+        if arcname in self._names:
+            return False
+        mtime = time.time() if mtime is None else mtime
+        if compress:
+            payload, crc = _deflate(data)
+            entry = _Entry(arcname, ZIP_DEFLATED, crc, len(payload), len(data), mtime, data=payload)
+        else:
+            entry = _Entry(arcname, ZIP_STORED, zlib.crc32(data), len(data), len(data), mtime, data=data)
+        self._add(entry)
+        return True
+
+    def _add(self, entry: _Entry):
+        self._names.add(entry.arcname)
+        self._entries.append(entry)
+        self._segments = None
+
+    # --- Layout ---
+
+    @staticmethod
+    def _name_and_flags(entry: _Entry) -> Tuple[bytes, int]:
+        try:
+            return entry.arcname.encode('ascii'), 0
+        except UnicodeEncodeError:
+            return entry.arcname.encode('utf-8'), _UTF8_FLAG
+
+    def _local_header(self, entry: _Entry) -> bytes:
+        name, flags = self._name_and_flags(entry)
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        zip64 = entry.size >= _ZIP32_LIMIT or entry.compressed_size >= _ZIP32_LIMIT
+        extra = struct.pack('<HHQQ', 0x0001, 16, entry.size, entry.compressed_size) if zip64 else b''
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 45 if zip64 else 20, flags, entry.method, dos_time, dos_date,
+            entry.crc, _ZIP32_LIMIT if zip64 else entry.compressed_size,
+            _ZIP32_LIMIT if zip64 else entry.size, len(name), len(extra)
+        ) + name + extra
+
+    def _central_header(self, entry: _Entry) -> bytes:
+        name, flags = self._name_and_flags(entry)
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        zip64_fields = []
+        size = entry.size
+        compressed_size = entry.compressed_size
+        offset = entry.offset
+        if size >= _ZIP32_LIMIT:
+            zip64_fields.append(size)
+            size = _ZIP32_LIMIT
+        if compressed_size >= _ZIP32_LIMIT:
+            zip64_fields.append(compressed_size)
+            compressed_size = _ZIP32_LIMIT
+        if offset >= _ZIP32_LIMIT:
+            zip64_fields.append(offset)
+            offset = _ZIP32_LIMIT
+        extra = struct.pack(f'<HH{len(zip64_fields)}Q', 0x0001, 8 * len(zip64_fields), *zip64_fields) \
+            if zip64_fields else b''
+        version = 45 if zip64_fields else 20
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | version, version, flags, entry.method,
+            dos_time, dos_date, entry.crc, compressed_size, size, len(name), len(extra), 0, 0, 0,
+            _UNIX_FILE_ATTR, offset
+        ) + name + extra
+
+    def _end_records(self, cd_offset: int, cd_size: int) -> bytes:
+        count = len(self._entries)
+        records = b''
+        if count > _ZIP32_COUNT_LIMIT or cd_offset >= _ZIP32_LIMIT or cd_size >= _ZIP32_LIMIT:
+            zip64_end_offset = cd_offset + cd_size
+            records += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+            records += struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1)
+            count = min(count, _ZIP32_COUNT_LIMIT)
+            cd_size = min(cd_size, _ZIP32_LIMIT)
+            cd_offset = min(cd_offset, _ZIP32_LIMIT)
+        return records + struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, cd_size, cd_offset, 0)
+
+    def _layout(self):
+        """
+        Lay the archive out as (offset, length, bytes or file path) segments.
+        """
+        if self._segments is not None:
+            return self._segments
+        segments = []
+        offset = 0
+
+        def add(length, payload):
+            nonlocal offset
+            if length:
+                segments.append((offset, length, payload))
+                offset += length
+
+        for entry in self._entries:
+            entry.offset = offset
+            header = self._local_header(entry)
+            add(len(header), header)
+            if entry.path is not None:
+                add(entry.compressed_size, entry.path)
+            else:
+                add(len(entry.data), entry.data)
+
+        cd_offset = offset
+        central = b''.join(self._central_header(entry) for entry in self._entries)
+        add(len(central), central)
+        end = self._end_records(cd_offset, len(central))
+        add(len(end), end)
+
+        self._segments = segments
+        self._size = offset
+        return segments
+
+    @property
+    def size(self) -> int:
+        """Total archive size in bytes."""
+        self._layout()
+        return self._size
+
+    @property
+    def last_modified(self) -> float:
+        """Newest member modification time."""
+        return max((entry.mtime for entry in self._entries), default=0)
+
+    @property
+    def etag(self) -> str:
+        """
+        Validator that changes whenever the archive bytes would: member names,
+        methods, CRCs, sizes and timestamps.
+        """
+        digest = hashlib.sha1()
+        for entry in self._entries:
+            digest.update(f"{entry.arcname}\0{entry.method}\0{entry.crc}\0{entry.size}\0"
+                          f"{entry.compressed_size}\0{int(entry.mtime)}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    # --- Output ---
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Yield the archive bytes from start up to (not including) end.
+        """
+        segments = self._layout()
+        end = self._size if end is None else min(end, self._size)
+        for seg_offset, length, payload in segments:
+            seg_end = seg_offset + length
+            if seg_end <= start:
+                continue
+            if seg_offset >= end:
+                break
+            lo = max(start, seg_offset) - seg_offset
+            hi = min(end, seg_end) - seg_offset
+            if isinstance(payload, bytes):
+                yield payload[lo:hi]
+                continue
+            with open(payload, 'rb') as f:
+                f.seek(lo)
+                remaining = hi - lo
+                while remaining > 0:
+                    chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f"{payload} changed while it was being sent")
+                    remaining -= len(chunk)
+                    yield chunk
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self.iter_range()